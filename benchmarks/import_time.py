@@ -0,0 +1,36 @@
+"""
+Measure the time taken to import parts of paddi_utils in a fresh interpreter, less the start-up time of the interpreter itself. Run it from the root of a checkout, e.g. on two commits to compare them::
+
+    python benchmarks/import_time.py --repeat 20
+"""
+from argparse import ArgumentParser
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+statements = ["from paddi_utils.data import Profiles",
+              "from paddi_utils.data import Diagnostic",
+              "import paddi_utils.db",
+              "from paddi_utils.db import Session"]
+
+def run(statement, repeat):
+    # Return the median wall time of running the statement in a new interpreter
+    times = []
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True, env=env, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--repeat", default=10, type=int)
+    args = parser.parse_args()
+
+    base = run("pass", args.repeat)
+    for statement in statements:
+        print("%-45s %8.3f s" % (statement, run(statement, args.repeat) - base))
@@ -0,0 +1,73 @@
+"""
+Time the catalog queries served by the indexes on the tags and output files (see :mod:`paddi_utils.db.simulation`), on a synthetic SQLite catalog first without those indexes and then after :func:`paddi_utils.db.session.migrate` has created them::
+
+    PYTHONPATH=. python benchmarks/query_indexes.py --sims 10000
+"""
+from argparse import ArgumentParser
+import os
+import tempfile
+import time
+
+import numpy as np
+import sqlalchemy
+
+from paddi_utils.db import Session, Simulation, Tag, OutputFile
+from paddi_utils.db.session import migrate
+
+indexes = ["ix_tags_name_value", "ix_tags_sim_id_name", "ix_outputfiles_sim_id_type_iter"]
+
+def build(session, sims, tags, files, seed=0):
+    # Fill the catalog with bulk inserts: each simulation has the given number of tags and diagnostic files
+    rng = np.random.default_rng(seed)
+    connection = session.connection()
+    connection.execute(Simulation.__table__.insert(), [{"id": i + 1, "path": "/runs/run%d" % i} for i in range(sims)])
+    names = ["Ri", "period", "Pe", "linear_growth", "linear_amplitude", "linear_kx", "linear_ky", "linear_kz", "kx", "kz"][:tags]
+    connection.execute(Tag.__table__.insert(), [{"sim_id": i + 1, "name": name, "value": float(value)} for i in range(sims) for name, value in zip(names, rng.random(len(names)))])
+    connection.execute(OutputFile.__table__.insert(), [{"sim_id": i + 1, "file": "/runs/run%d/OUT%02d" % (i, j), "type": "diagnostic", "iter": j} for i in range(sims) for j in range(files)])
+    session.commit()
+
+def timed(function, repeat):
+    # Return the median time of a function over a number of calls
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function(i)
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+def measure(session, sims, repeat):
+    ids = np.random.default_rng(1).integers(1, sims + 1, repeat).tolist()
+    return {"Query(q, \"Ri\") < 0.1": timed(lambda i: (Simulation.Query(session.query(Simulation), "Ri") < 0.1).all(), repeat),
+            "tags by sim_id and name": timed(lambda i: session.query(Tag).filter(Tag.sim_id == ids[i], Tag.name == "Ri").all(), repeat),
+            "output files by sim and type": timed(lambda i: session.query(OutputFile).filter(OutputFile.sim_id == ids[i], OutputFile.type == "diagnostic").order_by(OutputFile.iter).all(), repeat)}
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--sims", default=10000, type=int)
+    parser.add_argument("--tags", default=10, type=int, help="The number of tags per simulation")
+    parser.add_argument("--files", default=5, type=int, help="The number of output files per simulation")
+    parser.add_argument("--repeat", default=20, type=int)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        session = Session(url="sqlite:///" + os.path.join(directory, "catalog.db"))
+        build(session, args.sims, args.tags, args.files)
+
+        # Time the queries without the indexes, and then with them, as an existing catalog is migrated
+        engine = session.get_bind()
+        with engine.begin() as connection:
+            for name in indexes:
+                connection.execute(sqlalchemy.text("DROP INDEX %s" % name))
+        session.expire_all()
+        before = measure(session, args.sims, args.repeat)
+
+        migrate(engine)
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.text("ANALYZE"))
+        session.expire_all()
+        after = measure(session, args.sims, args.repeat)
+        session.close()
+
+    print("%d simulations, %d tags and %d output files" % (args.sims, args.sims * args.tags, args.sims * args.files))
+    for name in before:
+        print("%-30s %8.2f ms -> %8.2f ms" % (name, 1000.0 * before[name], 1000.0 * after[name]))
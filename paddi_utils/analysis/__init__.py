@@ -0,0 +1,7 @@
+"""
+The public classes of this module are imported lazily, when they are first accessed, as in :mod:`paddi_utils.data`.
+"""
+from paddi_utils.lazy import lazy_import
+
+__all__, __getattr__, __dir__ = lazy_import(__name__, {"HorizontalAverages": "paddi_utils.analysis.averages",
+                                                       "GrowthRates": "paddi_utils.analysis.growth"})
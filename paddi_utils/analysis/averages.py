@@ -0,0 +1,150 @@
+"""
+This module computes the horizontally averaged profiles of a PADDI simdat file: the mean vertical gradients of the buoyancy fields and their diffusive and advective fluxes.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import netCDF4 as nc
+
+class HorizontalAverages(object):
+    """
+    Compute horizontally averaged profiles from a simdat file, whose fields are stored as (time, z, y, x). Each snapshot is read once, field by field, and every profile is computed from that one read; the snapshots themselves are processed in a pool of processes. The usual use is to write the profiles to a netCDF file::
+
+        from paddi_utils.analysis import HorizontalAverages
+        from paddi_utils.data import Parameters
+
+        params = Parameters.from_file("parameter_file")
+        averages = HorizontalAverages("simdat1.cdf", params)
+        averages.to_netcdf("averages.nc").close()
+
+    For each field with short name n (see :attr:`HorizontalAverages.field_names`), the profiles are "grad" + n, the mean vertical gradient including the background stratification, "dflux" + n, the diffusive flux, and "aflux" + n, the advective flux, each at the interior z points.
+
+    :type file_name: :class:`str`
+    :param file_name: The name of the simdat file
+    :type parameters: :class:`paddi_utils.data.Parameters`
+    :param parameters: The parameters of the run
+    :type fields: :class:`list` of :class:`str`
+    :param fields: The buoyancy fields to average
+    :type velocity: :class:`str`
+    :param velocity: The vertical velocity field
+    """
+
+    field_names = {"Temp": ("T", "thermal_stratif_param", "thermal_diffusion_coeff"),
+                   "Chem": ("mu", "compositional_stratif_param", "compositional_diffusion_coeff")}
+    """The short name of each field in the output, and the parameters for its background stratification and diffusion coefficient"""
+
+    def __init__(self, file_name, parameters, fields=("Temp", "Chem"), velocity="uz"):
+        with nc.Dataset(file_name) as data:
+            self.length = len(data[velocity])
+            self.nz = data[velocity].shape[1]
+
+        self.file_name = file_name
+        self.fields = list(fields)
+        self.velocity = velocity
+        self.dz = parameters["z_extent_of_the_box"] / float(self.nz)
+        self.constants = {field: (parameters[self.field_names[field][1]], parameters[self.field_names[field][2]]) for field in self.fields}
+
+    def __len__(self):
+        return self.length
+
+    def variables(self):
+        """
+        Return the names of the profiles, in order
+
+        :rtype: :class:`list` of :class:`str`
+        :return: The names of the profiles
+        """
+        return [prefix + self.field_names[field][0] for field in self.fields for prefix in ("grad", "dflux", "aflux")]
+
+    @classmethod
+    def compute_record(cls, file_name, index, fields, velocity, dz, constants):
+        """
+        Compute the profiles of one snapshot. This reads the velocity and each field once. The horizontal mean is taken before the vertical difference, since the two commute, and the advective flux is a single fused product and sum.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the simdat file
+        :type index: :class:`int`
+        :param index: The index of the snapshot
+        :type fields: :class:`list` of :class:`str`
+        :param fields: The buoyancy fields to average
+        :type velocity: :class:`str`
+        :param velocity: The vertical velocity field
+        :type dz: :class:`float`
+        :param dz: The grid spacing in z
+        :type constants: :class:`dict`
+        :param constants: The background stratification and diffusion coefficient of each field
+
+        :rtype: :class:`dict` with :class:`str` keys and :class:`numpy.ndarray` values
+        :return: The profiles, keyed by name
+        """
+        profiles = {}
+        with nc.Dataset(file_name) as data:
+            data.set_auto_mask(False)
+            uz = data[velocity][index]
+
+            for field in fields:
+                name = cls.field_names[field][0]
+                stratification, diffusion = constants[field]
+                values = data[field][index]
+                area = values.shape[1] * values.shape[2]
+
+                # The centered difference spans two grid spacings
+                mean = values.mean(axis=(1, 2))
+                profiles["grad" + name] = (mean[2:] - mean[:-2]) / (2.0 * dz) + stratification
+                profiles["dflux" + name] = -diffusion * profiles["grad" + name]
+                profiles["aflux" + name] = np.einsum("ijk,ijk->i", values, uz)[1:-1] / area
+
+        return profiles
+
+    def compute(self, indices=None, workers=1):
+        """
+        Compute the profiles of a series of snapshots, in order
+
+        :type indices: :class:`list` of :class:`int` or `None`
+        :param indices: The indices of the snapshots; if `None`, use all of them
+        :type workers: :class:`int` or `None`
+        :param workers: The maximum number of processes; by default, 1, compute in this process, and if `None`, use one per processor
+
+        :rtype: generator of (:class:`int`, :class:`dict`)
+        :return: The index of each snapshot and its profiles, as from :func:`HorizontalAverages.compute_record`
+        """
+        if indices is None:
+            indices = range(self.length)
+        indices = list(indices)
+
+        compute = partial(HorizontalAverages.compute_record, self.file_name, fields=self.fields, velocity=self.velocity, dz=self.dz, constants=self.constants)
+        if len(indices) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for index, profiles in zip(indices, pool.map(compute, indices)):
+                    yield index, profiles
+        else:
+            for index in indices:
+                yield index, compute(index)
+
+    def to_netcdf(self, *args, indices=None, workers=1, **kwargs):
+        """
+        Compute the profiles and write them to a netcdf file, one whole record per snapshot
+
+        :param args: Passed to :class:`netCDF4.Dataset` constructor
+        :type indices: :class:`list` of :class:`int` or `None`
+        :param indices: The indices of the snapshots; if `None`, use all of them
+        :type workers: :class:`int` or `None`
+        :param workers: The maximum number of processes; by default, 1, compute in this process, and if `None`, use one per processor
+        :param kwargs: Passed to :class:`netCDF4.Dataset` constructor
+
+        :rtype: :class:`netCDF4.Dataset`
+        :return: The netcdf file object associated with the newly created file
+        """
+        obj = nc.Dataset(mode="w", *args, **kwargs)
+
+        z = obj.createDimension("Z", self.nz - 2)
+        records = obj.createDimension("time")
+        for name in self.variables():
+            obj.createVariable(name, "f8", ("time", "Z"))
+
+        for record, (index, profiles) in enumerate(self.compute(indices, workers=workers)):
+            for name in profiles:
+                obj[name][record] = profiles[name]
+
+        return obj
@@ -0,0 +1,250 @@
+"""
+This module fits the linear growth rate of the instabilities in a campaign of PADDI runs, from the maximum temperature perturbation in their diagnostic files. The fits run headless, in a pool of processes if requested, and the results are stored in the catalog (see :class:`paddi_utils.db.AnalysisCache`), so that fitting the campaign again only refits the runs whose diagnostic files have changed.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.optimize import curve_fit
+
+from paddi_utils.data.diagnostic import Diagnostic
+from paddi_utils.db.cache import AnalysisCache
+from paddi_utils.db.simulation import OutputFile, Tag
+
+class GrowthRates(object):
+    """
+    Fit exponential growth, a * exp(growth * t), to the linear phase of each run. The linear phase runs from the global minimum of :attr:`GrowthRates.column` up to the first point above :attr:`GrowthRates.threshold`, past which the perturbations are no longer small. Each fit is a closed-form weighted least squares in log space (see :func:`GrowthRates.fit_log`), falling back to a nonlinear fit only when that is not possible. The usual use is to fit every run of a query::
+
+        from paddi_utils.analysis.growth import GrowthRates
+        from paddi_utils.db import Session, Simulation
+
+        session = Session()
+        table = Simulation.Table(session, files=False).filter(Simulation.z_extent_of_the_box == 25.0)
+        results = GrowthRates(session).run([sim for sim, tags in table])
+
+    Each result is a dictionary of the "amplitude" and "growth" of the fit, the "start" and "end" indices of the linear phase in the diagnostic data, and the "method" used. A run whose column never reaches :attr:`GrowthRates.minimum`, or that has no linear phase, is recorded with zero amplitude and growth. The amplitude and growth are also written to the :attr:`GrowthRates.tags` of each run.
+
+    :type session: :class:`sqlalchemy.orm.session.Session`
+    :param session: The session connected to the database
+    :type workers: :class:`int` or `None`
+    :param workers: The maximum number of processes; by default, 1, fit in this process, and if `None`, use one per processor. A pool of processes must be started from code under an ``if __name__ == "__main__":`` guard on platforms that spawn rather than fork new processes
+    """
+
+    analysis = "linear_growth"
+    """The name of the results in the catalog; a subclass that changes the fit should use a different name or version"""
+
+    version = 2
+    """The version of the results in the catalog"""
+
+    column = "Temp_max"
+    """The diagnostic column to fit"""
+
+    threshold = 1.0
+    """The value of the fitted column above which the run is taken to be nonlinear; the fields are unitless, so this is where perturbations become of order unity"""
+
+    minimum = 0.5
+    """The value that the fitted column must reach for a run to be fitted at all; a run whose column stays below it never becomes unstable, and is recorded with zero growth"""
+
+    guess = (1.0e-5, -5.)
+    """The initial guess of the amplitude and the base 10 logarithm of the growth rate for the nonlinear fit"""
+
+    tags = {"amplitude": "linear_amplitude",
+            "growth": "linear_growth"}
+    """The results written to tags, and the name of each tag"""
+
+    def __init__(self, session, workers=1):
+        self.session = session
+        self.workers = workers
+        self.cache = AnalysisCache(session, self.analysis, self.version, types=["diagnostic"])
+
+    @staticmethod
+    def model(t, a, l):
+        """
+        The model of the nonlinear fit, with the growth rate as its base 10 logarithm l so that it stays positive
+        """
+        return a * np.exp(10. ** l * t)
+
+    @classmethod
+    def window(cls, values):
+        """
+        Find the linear phase of a run
+
+        :type values: :class:`numpy.ndarray`
+        :param values: The values of the fitted column
+
+        :rtype: (:class:`int`, :class:`int`)
+        :return: The indices of the start and (exclusive) end of the linear phase; if the values never exceed :attr:`GrowthRates.threshold`, the phase runs to the end of the data
+        """
+        start = int(np.argmin(values))
+        above = values > cls.threshold
+        end = int(np.argmax(above)) if above.any() else len(values)
+        return start, end
+
+    @staticmethod
+    def fit_log(t, values):
+        """
+        Fit the logarithm of the values with a straight line, in closed form. Each point is weighted by the fourth power of its value, which to first order is the objective of a nonlinear fit with uncertainties inversely proportional to the values, so that the late, larger points of the linear phase dominate.
+
+        :type t: :class:`numpy.ndarray`
+        :param t: The times
+        :type values: :class:`numpy.ndarray`
+        :param values: The values
+
+        :rtype: (:class:`float`, :class:`float`) or `None`
+        :return: The amplitude and growth rate, or `None` if the fit is not possible because a value is not positive or fewer than two points carry weight
+        """
+        if not np.all(values > 0.0):
+            return None
+
+        weights = (values / values.max()) ** 4
+        logs = np.log(values)
+        total = weights.sum()
+        t_mean = np.dot(weights, t) / total
+        log_mean = np.dot(weights, logs) / total
+        variance = np.dot(weights, (t - t_mean) ** 2)
+        if not variance > 0.0:
+            return None
+
+        growth = np.dot(weights, (t - t_mean) * (logs - log_mean)) / variance
+        amplitude = np.exp(log_mean - growth * t_mean)
+        if not (np.isfinite(growth) and np.isfinite(amplitude)):
+            return None
+        return float(amplitude), float(growth)
+
+    @classmethod
+    def fit_curve(cls, t, values):
+        """
+        Fit the values with :func:`GrowthRates.model` by nonlinear least squares, as a fallback for :func:`GrowthRates.fit_log`
+
+        :type t: :class:`numpy.ndarray`
+        :param t: The times
+        :type values: :class:`numpy.ndarray`
+        :param values: The values
+
+        :rtype: (:class:`float`, :class:`float`)
+        :return: The amplitude and growth rate, or NaN if the fit does not converge
+        """
+        sigma = 1.0 / np.maximum(np.abs(values), np.finfo(np.float64).tiny)
+        try:
+            params, cov = curve_fit(cls.model, t, values, p0=cls.guess, method="dogbox", sigma=sigma)
+        except (RuntimeError, ValueError):
+            return np.nan, np.nan
+        return float(params[0]), float(10.0 ** params[1])
+
+    @classmethod
+    def fit(cls, t, values):
+        """
+        Fit the linear phase of a run
+
+        :type t: :class:`numpy.ndarray`
+        :param t: The times
+        :type values: :class:`numpy.ndarray`
+        :param values: The values of the fitted column
+
+        :rtype: :class:`dict`
+        :return: The result of the fit, as described in :class:`GrowthRates`
+        """
+        t = np.asarray(t, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        start, end = cls.window(values)
+
+        # A run that never reaches the minimum, or without at least two points in the linear phase, is decaying
+        if not values.max() >= cls.minimum or end - start < 2:
+            return {"amplitude": 0.0, "growth": 0.0, "start": start, "end": end, "method": "none"}
+
+        method = "log"
+        params = cls.fit_log(t[start:end], values[start:end])
+        if params is None:
+            method = "curve_fit"
+            params = cls.fit_curve(t[start:end], values[start:end])
+
+        amplitude, growth = params
+        return {"amplitude": amplitude, "growth": growth, "start": start, "end": end, "method": method}
+
+    @classmethod
+    def fit_files(cls, files):
+        """
+        Read the diagnostic files of a run and fit its linear phase. This only uses its arguments, so that it can be run in another process.
+
+        :type files: :class:`list` of :class:`str`
+        :param files: The diagnostic files of the run, in time order
+
+        :rtype: :class:`dict`
+        :return: The result of the fit, as from :func:`GrowthRates.fit`; if the run has no diagnostic data that can be read, the amplitude and growth are NaN and the method is "missing"
+        """
+        missing = {"amplitude": np.nan, "growth": np.nan, "start": 0, "end": 0, "method": "missing"}
+        if not files:
+            return missing
+        try:
+            data = Diagnostic(files, columns=["t", cls.column], workers=1)
+        except (IOError, ValueError, IndexError):
+            # A run that has only just started may not have written a whole header
+            return missing
+        if not len(data):
+            return missing
+        return cls.fit(data["t"].values, data[cls.column].values)
+
+    def diagnostic_files(self, ids):
+        """
+        Return the diagnostic files of a list of simulations, from batched selects
+
+        :type ids: :class:`list` of :class:`int`
+        :param ids: The ids of the simulations
+
+        :rtype: :class:`dict` of :class:`list` of :class:`str` with :class:`int` keys
+        :return: The sorted diagnostic files of each simulation, keyed by id
+        """
+        files = {sim_id: [] for sim_id in ids}
+        for start in range(0, len(ids), self.cache.batch_size):
+            query = self.session.query(OutputFile.sim_id, OutputFile.file)
+            query = query.filter(OutputFile.type == "diagnostic", OutputFile.sim_id.in_(ids[start:start + self.cache.batch_size]))
+            for sim_id, file in query:
+                files[sim_id].append(file)
+        return {sim_id: sorted(names) for sim_id, names in files.items()}
+
+    def write_tags(self, results):
+        """
+        Replace the :attr:`GrowthRates.tags` of each simulation with its results, with bulk statements in the current transaction. Runs without diagnostic data are left without tags.
+
+        :type results: :class:`list` of (:class:`int`, :class:`dict`)
+        :param results: The id and result of each simulation
+        """
+        connection = self.session.connection()
+        table = Tag.__table__
+        results = [(sim_id, result) for sim_id, result in results if result["method"] != "missing"]
+        ids = [sim_id for sim_id, result in results]
+        for start in range(0, len(ids), self.cache.batch_size):
+            connection.execute(table.delete().where(table.c.sim_id.in_(ids[start:start + self.cache.batch_size]) & table.c.name.in_(list(self.tags.values()))))
+
+        rows = [{"sim_id": sim_id, "name": name, "value": result[key]} for sim_id, result in results for key, name in self.tags.items()]
+        if rows:
+            connection.execute(table.insert(), rows)
+
+    def run(self, sims, refit=False):
+        """
+        Fit the runs whose stored results are missing or out of date, and store their results in one transaction. The results of runs without diagnostic data are stored too, so that they are only tried again once their diagnostic files change.
+
+        :type sims: :class:`list` of :class:`paddi_utils.db.Simulation` or :class:`int`
+        :param sims: The simulations, or their ids
+        :type refit: :class:`bool`
+        :param refit: If `True`, fit every run, even those with valid stored results
+
+        :rtype: :class:`dict` of :class:`dict` with :class:`int` keys
+        :return: The result of each run, keyed by simulation id
+        """
+        stale = list(sims) if refit else self.cache.stale(sims)
+        ids = [self.cache.key(sim) for sim in stale]
+        files = self.diagnostic_files(ids)
+
+        fit = type(self).fit_files
+        if len(ids) > 1 and self.workers != 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                fits = list(pool.map(fit, [files[sim_id] for sim_id in ids], chunksize=16))
+        else:
+            fits = [fit(files[sim_id]) for sim_id in ids]
+
+        results = list(zip(ids, fits))
+        self.write_tags(results)
+        self.cache.put_many(results)
+        self.session.commit()
+
+        return self.cache.get_many(sims)
@@ -1,6 +1,12 @@
-from paddi_utils.data.parameters import Parameters
-from paddi_utils.data.diagnostic import Diagnostic
-from paddi_utils.data.profiles import Profiles
-from paddi_utils.data.spectra import Spectra
-from paddi_utils.data.dump import Dump
-from paddi_utils.data.compressed import CompressedData
\ No newline at end of file
+"""
+The public classes of this module are imported lazily, when they are first accessed (see :mod:`paddi_utils.lazy`), so that e.g. a script using only :class:`Profiles` does not pay for importing pandas and netCDF4.
+"""
+from paddi_utils.lazy import lazy_import
+
+__all__, __getattr__, __dir__ = lazy_import(__name__, {"Parameters": "paddi_utils.data.parameters",
+                                                       "Diagnostic": "paddi_utils.data.diagnostic",
+                                                       "Profiles": "paddi_utils.data.profiles",
+                                                       "Spectra": "paddi_utils.data.spectra",
+                                                       "Dump": "paddi_utils.data.dump",
+                                                       "CompressedData": "paddi_utils.data.compressed",
+                                                       "ParameterTable": "paddi_utils.data.table"})
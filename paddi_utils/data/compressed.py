@@ -0,0 +1,724 @@
+"""
+This module provides a class designed to read from a compressed j__data file output from PADDI.
+
+The files are written by ``jcwrite_`` in ``extern/jutils``. Each file opens with the character "J" and a magic number, followed by an info record giving the dimensions of the data. The rest of the file is a sequence of records, one per field per output step. Each record is a "J", the magic number of the field (e.g., :data:`JPTEMP`), and a text header with the iteration, time, timestep, the minimum and maximum of the field, and its dimensions. The field is then stored as a series of subimages of at most 65535 rows of x values, each either a grayscale JPEG image (8- or 12-bit) scaled between the minimum and maximum or an XDR stream of floats or doubles. Each subimage is preceded by its length and followed by the length of the record so far.
+
+The XDR streams are decoded directly with numpy. The JPEG subimages are decoded with `imagecodecs <https://pypi.org/project/imagecodecs/>`_ (the "jdata" extra) if it is installed, and otherwise with Pillow, which can only read 8-bit images.
+"""
+import os
+import re
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import netCDF4 as nc
+
+try:
+    import imagecodecs
+except ImportError:
+    imagecodecs = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# The magic numbers from jcmagic.h
+JC2D = 76
+
+JCGRID = 10
+JCTEMP = 11
+JCCHEM = 12
+JCSTREAM = 13
+JCPSI = 14
+JCPSIDX = 15
+JCPSIDY = 16
+
+JC3D = 77
+JC3R = 78
+JC3S = 79
+
+JPTEMP = 20
+JPAX = 21
+JPAY = 22
+JPVELX = 23
+JPVELY = 24
+JPVELZ = 25
+JPPRES = 26
+JPCHEM = 27
+JPBX = 28
+JPBY = 29
+JPBZ = 30
+
+JPGRID = 37
+
+JXDR = 1234567
+"""The value of both the minimum and maximum in a record header marking an XDR float stream (twice this marks an XDR double stream)"""
+
+class CompressedFile(object):
+    """
+    This context manager is used to more conveniently read the compressed data files. The syntax is usually as follows::
+
+        with CompressedFile(file_name) as file:
+            while (True):
+                # Read each compressed entry
+                magic, data, iteration, time, dt = file.read()
+
+    The records can also be read in any order with :func:`CompressedFile.read_record`, using the table of records in :attr:`CompressedFile.records`.
+
+    :type file_name: :class:`str`
+    :param file_name: The name of the file to read from
+    :type index: :class:`bool`
+    :param index: If `True`, keep the table of records in a sidecar index file (see :func:`CompressedFile.index_records`)
+    """
+
+    record_dtype = np.dtype([("offset", np.int64),
+                             ("magic", np.int32),
+                             ("iteration", np.int64),
+                             ("time", np.float32),
+                             ("dt", np.float32),
+                             ("xmin", np.float32),
+                             ("xmax", np.float32),
+                             ("nx", np.int64),
+                             ("ny", np.int64),
+                             ("nz", np.int64),
+                             ("first", np.int64),
+                             ("count", np.int64)])
+    """The table of records in a file: the byte offset of the record, the magic number of the field, the header values, and the position and number of its subimages in the subimage table"""
+
+    subimage_dtype = np.dtype([("offset", np.int64),
+                               ("length", np.int64),
+                               ("rows", np.int64)])
+    """The table of subimages in a file: the byte offset and length of the encoded data and the number of rows of x values it holds"""
+
+    _token = re.compile(rb"\s*(\S+)")
+    _space = re.compile(rb"\s*")
+
+    def __init__(self, file_name, index=True):
+        self.file_name = file_name
+        self.save_index = index
+        self.file = None
+        self.index = -1
+
+    def __enter__(self):
+        """
+        Open the file, returning this object as a handle
+
+        :rtype: :class:`CompressedFile`
+        :return: This object as a handle to the file
+        """
+        self.file = open(self.file_name, "rb")
+        self.magic, self.dims, self.info, start = self.read_info(self.file)
+        self.records, self.subimages = self.index_records(self.file_name, save=self.save_index)
+
+        # Files without an info record take their shape from the first record
+        if self.dims is None and len(self.records) > 0:
+            self.dims = tuple(int(self.records[0][key]) for key in ("nz", "ny", "nx"))
+
+        self.temp_data = None
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """
+        Exit the context manager with the usual parameters
+        """
+        self.file.close()
+        self.file = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def shape(self):
+        """
+        Return the shape of the compressed data as (z, y, x), so that x varies fastest as in the file
+
+        :rtype: :class:`tuple` of :class:`int`
+        :return: The shape of the compressed data
+        """
+        return self.dims
+
+    def read(self):
+        """
+        Read the next compressed entry from the file. The returned array is reused by the next call, so copy it if it needs to be kept.
+
+        :rtype: :class:`int`, :class:`numpy.ndarray`, :class:`int`, :class:`float`, :class:`float`
+        :return: The magic number identifier for the entry, the data, the timestep number from the run, the time at that timestep, the timestep duration at that timestep
+        """
+        if self.index + 1 >= len(self.records):
+            raise EOFError("End of file")
+        self.index += 1
+
+        record = self.records[self.index]
+        shape = (record["nz"], record["ny"], record["nx"])
+        if self.temp_data is None or self.temp_data.shape != shape:
+            self.temp_data = np.empty(shape, dtype=np.float32)
+
+        self.decode_record(self.file, record, self.subimages, self.temp_data)
+        return int(record["magic"]), self.temp_data, int(record["iteration"]), record["time"], record["dt"]
+
+    def read_record(self, index, out=None):
+        """
+        Read any one record from the file
+
+        :type index: :class:`int`
+        :param index: The index of the record in :attr:`CompressedFile.records`
+        :type out: :class:`numpy.ndarray` or `None`
+        :param out: A C-contiguous float32 array of shape (z, y, x) to decode into; if `None`, a new array is allocated
+
+        :rtype: :class:`numpy.ndarray`
+        :return: The decoded field
+        """
+        record = self.records[index]
+        if out is None:
+            out = np.empty((record["nz"], record["ny"], record["nx"]), dtype=np.float32)
+        return self.decode_record(self.file, record, self.subimages, out)
+
+    @staticmethod
+    def divisions(ny, nz):
+        """
+        Return the number of rows of x values in each subimage of a record, as in ``calcdivisions`` from jutils
+
+        :type ny: :class:`int`
+        :param ny: The y dimension of the data
+        :type nz: :class:`int`
+        :param nz: The z dimension of the data
+
+        :rtype: :class:`list` of :class:`int`
+        :return: The number of rows in each subimage, in order
+        """
+        length = ny * nz
+        subimages = 1
+        while length // subimages > 256 * 256 - 1:
+            subimages += 1
+        chunk = length // subimages
+
+        rows = []
+        while length > 256 * 256 - 1:
+            length -= chunk
+            rows.append(chunk)
+        rows.append(length)
+        return rows
+
+    @classmethod
+    def read_info(cls, file):
+        """
+        Read the magic number and the info record at the start of an open file
+
+        :type file: binary file object
+        :param file: The open file
+
+        :rtype: :class:`int`, :class:`tuple` of :class:`int` or `None`, :class:`dict`, :class:`int`
+        :return: The magic number of the file (0 if it has none), the shape of the data as (z, y, x) (`None` if there is no info record), the named values in the info record, and the offset of the first record
+        """
+        file.seek(0)
+        buf = file.read(2 ** 16)
+
+        magic, position = 0, 0
+        if buf[:1] == b"J":
+            magic, position = buf[1], 2
+
+        # There is no info record, so the first record follows directly
+        if buf[position:position + 1] in (b"J", b""):
+            return magic, None, {}, position
+
+        match = cls._token.match(buf, position)
+        if match.group(1) != b"info2":
+            # The old format holds ra, ras, iddc, le, numx, numy, numz
+            tokens = []
+            for i in range(7):
+                match = cls._token.match(buf, position)
+                tokens.append(match.group(1))
+                position = match.end()
+            info = {"ra": float(tokens[0]), "ras": float(tokens[1]), "iddc": int(tokens[2]), "le": float(tokens[3])}
+            numx, numy, numz = (int(token) for token in tokens[4:])
+            return magic, (numz, numy, numx), info, cls._space.match(buf, position).end()
+
+        # The info2 format holds numx, numy, numz, npde, ninfo, clen, then ninfo values and ninfo names of clen characters
+        tokens = []
+        position = match.end()
+        for i in range(6):
+            match = cls._token.match(buf, position)
+            tokens.append(int(match.group(1)))
+            position = match.end()
+        numx, numy, numz, npde, ninfo, clen = tokens
+
+        values = []
+        for i in range(ninfo):
+            match = cls._token.match(buf, position)
+            values.append(float(match.group(1)))
+            position = cls._space.match(buf, match.end()).end()
+
+        names = buf[position:position + ninfo * clen].decode(errors="replace")
+        names = [names[i * clen:(i + 1) * clen].strip() for i in range(ninfo)]
+        info = dict(zip(names, values))
+        info["npde"] = npde
+
+        return magic, (numz, numy, numx), info, position + ninfo * clen + 1
+
+    @classmethod
+    def scan_records(cls, file_name):
+        """
+        Scan a file for its records and subimages, without decoding any data. Only the record headers and the subimage lengths are read, so this is fast even for very large files. A record that is cut short at the end of the file (e.g., one that is still being written) is left out.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the file to scan
+
+        :rtype: :class:`numpy.ndarray` of :attr:`CompressedFile.record_dtype`, :class:`numpy.ndarray` of :attr:`CompressedFile.subimage_dtype`
+        :return: The table of records and the table of subimages, in file order
+        """
+        records = []
+        subimages = []
+
+        with open(file_name, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            position = cls.read_info(file)[3]
+
+            while position < size:
+                file.seek(position)
+                buf = file.read(256)
+                if buf[:1] != b"J":
+                    raise IOError("Wrong magic number at byte %i of %s; maybe not a j__data file" % (position, file_name))
+
+                # The header is read as "%d%e%e%e%e%d%d%d" followed by one character
+                header = []
+                end = 2
+                for i in range(8):
+                    match = cls._token.match(buf, end)
+                    if match is None:
+                        break
+                    header.append(match.group(1))
+                    end = match.end()
+                if len(header) < 8 or end >= len(buf):
+                    break
+
+                record = [position, buf[1], int(header[0])] + [float(value) for value in header[1:5]] + [int(value) for value in header[5:]]
+                position += end + 1
+
+                first = len(subimages)
+                complete = True
+                for rows in cls.divisions(record[-2], record[-1]):
+                    # Each subimage is its length (counted from the length itself), the data and the length of the record so far
+                    file.seek(position)
+                    buf = file.read(64)
+                    match = cls._token.match(buf)
+                    if match is None:
+                        complete = False
+                        break
+                    start = position + match.start(1)
+                    data = position + match.end() + 1
+                    length = int(match.group(1))
+
+                    file.seek(start + length)
+                    buf = file.read(64)
+                    match = cls._token.match(buf)
+                    if match is None or start + length > size:
+                        complete = False
+                        break
+
+                    subimages.append((data, start + length - data, rows))
+                    position = start + length + cls._space.match(buf, match.end()).end()
+
+                if not complete:
+                    del subimages[first:]
+                    break
+
+                records.append(tuple(record) + (first, len(subimages) - first))
+
+        return np.array(records, dtype=cls.record_dtype), np.array(subimages, dtype=cls.subimage_dtype)
+
+    @staticmethod
+    def index_name(file_name):
+        """
+        Return the name of the sidecar index file for a given data file. This is a hidden file in the same directory.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the data file
+
+        :rtype: :class:`str`
+        :return: The name of the index file
+        """
+        directory, base = os.path.split(file_name)
+        return os.path.join(directory, "." + base + ".records.npz")
+
+    @classmethod
+    def index_records(cls, file_name, save=True):
+        """
+        Return the tables of records and subimages for a file, as from :func:`CompressedFile.scan_records`, using the sidecar index file given by :func:`CompressedFile.index_name` where possible. The index records the size and modification time of the file, and the file is only scanned again if either of these has changed. If the index cannot be written (e.g., the directory is read-only), the tables are simply returned.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the file to index
+        :type save: :class:`bool`
+        :param save: If `False`, neither read nor write the sidecar index and scan the file directly
+
+        :rtype: :class:`numpy.ndarray` of :attr:`CompressedFile.record_dtype`, :class:`numpy.ndarray` of :attr:`CompressedFile.subimage_dtype`
+        :return: The table of records and the table of subimages, in file order
+        """
+        if not save:
+            return cls.scan_records(file_name)
+
+        stat = os.stat(file_name)
+        index_name = cls.index_name(file_name)
+
+        # Use the existing index if it describes the file as it is now
+        try:
+            with np.load(index_name) as index:
+                if index["size"] == stat.st_size and index["mtime"] == stat.st_mtime_ns:
+                    return index["records"], index["subimages"]
+        except (IOError, OSError, KeyError, ValueError):
+            pass
+
+        records, subimages = cls.scan_records(file_name)
+
+        # Write the new index atomically, so that concurrent readers never see a partial file
+        temp_name = "%s.%i.tmp" % (index_name, os.getpid())
+        try:
+            with open(temp_name, "wb") as file:
+                np.savez(file, records=records, subimages=subimages, size=stat.st_size, mtime=stat.st_mtime_ns)
+            os.replace(temp_name, index_name)
+        except (IOError, OSError):
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+
+        return records, subimages
+
+    @staticmethod
+    def jpeg_precision(data):
+        """
+        Return the sample precision in bits of a JPEG image from its start of frame marker
+
+        :type data: :class:`bytes`
+        :param data: The encoded image
+
+        :rtype: :class:`int`
+        :return: The number of bits per sample (8 or 12)
+        """
+        position = 2
+        while position + 4 < len(data):
+            marker = data[position + 1]
+            # The start of frame markers are 0xC0 to 0xCF, except for 0xC4 (DHT), 0xC8 (JPG) and 0xCC (DAC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                return data[position + 4]
+            position += 2 + (data[position + 2] << 8) + data[position + 3]
+        raise IOError("No start of frame marker in JPEG subimage")
+
+    @classmethod
+    def decode_jpeg(cls, data):
+        """
+        Decode one JPEG subimage, using imagecodecs if it is available and Pillow otherwise. PADDI usually writes 12-bit images, which only imagecodecs can decode, so the "jdata" extra of this package should be installed to read them.
+
+        :type data: :class:`bytes`
+        :param data: The encoded image
+
+        :rtype: :class:`numpy.ndarray`, :class:`int`
+        :return: The image as an array of integers and its precision in bits
+        """
+        precision = cls.jpeg_precision(data)
+        if imagecodecs is not None:
+            return imagecodecs.jpeg_decode(data), precision
+        if Image is not None and precision <= 8:
+            return np.asarray(Image.open(BytesIO(data))), precision
+        if precision > 8:
+            raise ImportError("Decoding %i-bit JPEG subimages requires imagecodecs, as Pillow only reads 8-bit images; install it with the \"jdata\" extra, e.g. pip install paddi_utils[jdata]" % precision)
+        raise ImportError("Decoding JPEG subimages requires imagecodecs (the \"jdata\" extra, e.g. pip install paddi_utils[jdata]) or Pillow")
+
+    @classmethod
+    def decode_subimage(cls, fd, record, subimage, values):
+        """
+        Decode one subimage of a record into a preallocated array. The data are read with :func:`os.pread`, so that any number of threads can decode from the same file descriptor at once, and the decoding itself is done by numpy and the JPEG library, which release the GIL.
+
+        :type fd: :class:`int`
+        :param fd: The file descriptor of the open file
+        :type record: :class:`numpy.void` of :attr:`CompressedFile.record_dtype`
+        :param record: The record the subimage belongs to
+        :type subimage: :class:`numpy.void` of :attr:`CompressedFile.subimage_dtype`
+        :param subimage: The subimage to decode
+        :type values: :class:`numpy.ndarray`
+        :param values: A contiguous float32 array with as many elements as the subimage to decode into
+        """
+        xmin, xmax = record["xmin"], record["xmax"]
+
+        if xmin == JXDR and xmax == JXDR:
+            values[...] = np.frombuffer(os.pread(fd, 4 * len(values), subimage["offset"]), dtype=">f4")
+        elif xmin == 2 * JXDR and xmax == 2 * JXDR:
+            values[...] = np.frombuffer(os.pread(fd, 8 * len(values), subimage["offset"]), dtype=">f8")
+        else:
+            image, precision = cls.decode_jpeg(os.pread(fd, subimage["length"], subimage["offset"]))
+            # Scale the pixels in single precision, as jcread does
+            span = np.float32((xmax - xmin) / np.float32(2 ** precision - 1))
+            np.multiply(image.reshape(-1), span, out=values, casting="unsafe")
+            values += xmin
+
+    @classmethod
+    def split_record(cls, record, subimages, out):
+        """
+        Pair each subimage of a record with the part of the output array it fills
+
+        :type record: :class:`numpy.void` of :attr:`CompressedFile.record_dtype`
+        :param record: The record to split
+        :type subimages: :class:`numpy.ndarray` of :attr:`CompressedFile.subimage_dtype`
+        :param subimages: The table of subimages of the file
+        :type out: :class:`numpy.ndarray`
+        :param out: A C-contiguous float32 array with as many elements as the record
+
+        :rtype: :class:`list` of (:class:`numpy.void`, :class:`numpy.ndarray`)
+        :return: The subimages of the record and the views of out that they decode into
+        """
+        flat = out.reshape(-1)
+        if flat.size != record["nx"] * record["ny"] * record["nz"]:
+            raise ValueError("Output of size %i cannot hold a record of shape %s" % (flat.size, (record["nz"], record["ny"], record["nx"])))
+
+        parts = []
+        position = 0
+        for subimage in subimages[record["first"]:record["first"] + record["count"]]:
+            size = record["nx"] * subimage["rows"]
+            parts.append((subimage, flat[position:position + size]))
+            position += size
+        return parts
+
+    @classmethod
+    def decode_record(cls, file, record, subimages, out):
+        """
+        Decode one record from an open file into a preallocated array
+
+        :type file: binary file object
+        :param file: The open file
+        :type record: :class:`numpy.void` of :attr:`CompressedFile.record_dtype`
+        :param record: The record to decode
+        :type subimages: :class:`numpy.ndarray` of :attr:`CompressedFile.subimage_dtype`
+        :param subimages: The table of subimages of the file
+        :type out: :class:`numpy.ndarray`
+        :param out: A C-contiguous float32 array with as many elements as the record to decode into
+
+        :rtype: :class:`numpy.ndarray`
+        :return: The array out, holding the decoded field
+        """
+        for subimage, values in cls.split_record(record, subimages, out):
+            cls.decode_subimage(file.fileno(), record, subimage, values)
+        return out
+
+class CompressedData(object):
+    """
+    An object designed to read a series of compressed output files from PADDI and extract data from them. Each snapshot (the set of fields output at one iteration) can be read on its own with :func:`CompressedData.read`. Note that in general, these files are too large to read into memory at once, so the best way to access all of the results is to use the :func:`CompressedData.to_netcdf` method to convert the compressed data to a netcdf file, which can then be accessed as normal.
+
+    :type files: :class:`list` of :class:`str`
+    :param files: A collection of file names to be read in order
+    :type format: :class:`dict` with :class:`int` keys and :class:`str` values
+    :param format: A format to use to translate the integer "magic" numbers from jutils to a string; if `None`, instead use :attr:`CompressedData.default_format`
+    :type index: :class:`bool`
+    :param index: If `True`, keep the table of records of each file in a sidecar index file (see :func:`CompressedFile.index_records`)
+    """
+    default_format = {JPTEMP: "Temp",
+                      JPCHEM: "Chem",
+                      JPVELX: "ux",
+                      JPVELY: "uy",
+                      JPVELZ: "uz",
+                      JPBX: "vortx",
+                      JPBY: "vorty",
+                      JPBZ: "vortz"}
+    """A default format to use for converting jutils "magic" numbers to strings. This can be overridden."""
+
+    def __init__(self, files, format=None, index=True):
+        # Use default format if one is not provided
+        if format is None:
+            format = CompressedData.default_format
+
+        # Check whether files is a single file or a list of files
+        if isinstance(files, str):
+            files = [files]
+
+        self.format = format
+        self.files = files
+
+        with CompressedFile(files[0], index=index) as file:
+            self.shape = file.shape()
+
+        # A new snapshot starts each time the iteration changes
+        self.tables = [CompressedFile.index_records(file_name, save=index) for file_name in files]
+        self.iterations = []
+        self.times = []
+        self.lookup = {}
+        for file_index, (records, subimages) in enumerate(self.tables):
+            for record_index, record in enumerate(records):
+                if not self.iterations or record["iteration"] != self.iterations[-1]:
+                    self.iterations.append(int(record["iteration"]))
+                    self.times.append(float(record["time"]))
+                self.lookup[(len(self.iterations) - 1, int(record["magic"]))] = (file_index, record_index)
+
+    def __len__(self):
+        return len(self.iterations)
+
+    def fields(self):
+        """
+        Return the names of the fields present in the files, in the order of :attr:`CompressedData.format`
+
+        :rtype: :class:`list` of :class:`str`
+        :return: The names of the fields
+        """
+        magics = set(magic for snapshot, magic in self.lookup)
+        return [self.format[magic] for magic in self.format if magic in magics]
+
+    def magic(self, field):
+        """
+        Translate a field name into its jutils "magic" number
+
+        :type field: :class:`str` or :class:`int`
+        :param field: The name of the field, or its magic number
+
+        :rtype: :class:`int`
+        :return: The magic number of the field
+        """
+        if isinstance(field, str):
+            for magic in self.format:
+                if self.format[magic] == field:
+                    return magic
+            raise KeyError(field)
+        return field
+
+    def read(self, index, field, out=None):
+        """
+        Read one field of one snapshot
+
+        :type index: :class:`int`
+        :param index: The index of the snapshot; negative indices count back from the last snapshot
+        :type field: :class:`str` or :class:`int`
+        :param field: The name of the field, or its magic number
+        :type out: :class:`numpy.ndarray` or `None`
+        :param out: A C-contiguous float32 array of shape (z, y, x) to decode into; if `None`, a new array is allocated
+
+        :rtype: :class:`numpy.ndarray`
+        :return: The decoded field, with shape (z, y, x)
+        """
+        if index < 0:
+            index += len(self.iterations)
+        file_index, record_index = self.lookup[(index, self.magic(field))]
+        records, subimages = self.tables[file_index]
+        record = records[record_index]
+
+        if out is None:
+            out = np.empty((record["nz"], record["ny"], record["nx"]), dtype=np.float32)
+
+        with open(self.files[file_index], "rb") as file:
+            return CompressedFile.decode_record(file, record, subimages, out)
+
+    def read_many(self, indices, fields, workers=None, out=None):
+        """
+        Read one or more fields of many snapshots at once, e.g. for time averages. Every subimage of every requested record is decoded concurrently in a pool of threads straight into its place in a single preallocated array. The reads and the decoding (numpy and the JPEG library) release the GIL, so this scales with the number of cores.
+
+        :type indices: :class:`list` of :class:`int`
+        :param indices: The indices of the snapshots; negative indices count back from the last snapshot
+        :type fields: :class:`str`, :class:`int` or :class:`list`
+        :param fields: The name or magic number of a field, or a list of these
+        :type workers: :class:`int` or `None`
+        :param workers: The number of threads to use; if `None`, use the number of processors, and if 1, decode in this thread
+        :type out: :class:`numpy.ndarray` or `None`
+        :param out: A C-contiguous float32 array of shape (t, z, y, x) for a single field, or (field, t, z, y, x) for a list of fields, to decode into; if `None`, a new array is allocated
+
+        :rtype: :class:`numpy.ndarray` or :class:`dict` with :class:`str` keys and :class:`numpy.ndarray` values
+        :return: For a single field, the array of shape (t, z, y, x); for a list of fields, a dictionary of such arrays (views into out), keyed by the field names
+        """
+        single = isinstance(fields, (str, int))
+        if single:
+            fields = [fields]
+        indices = [index + len(self.iterations) if index < 0 else index for index in indices]
+
+        shape = (len(fields), len(indices)) + tuple(self.shape)
+        if out is None:
+            out = np.empty(shape, dtype=np.float32)
+        blocks = out.reshape(shape)
+
+        # Each task is one subimage and the part of the output it fills
+        tasks = []
+        descriptors = {}
+        try:
+            for i, field in enumerate(fields):
+                magic = self.magic(field)
+                for j, index in enumerate(indices):
+                    file_index, record_index = self.lookup[(index, magic)]
+                    records, subimages = self.tables[file_index]
+                    record = records[record_index]
+
+                    if file_index not in descriptors:
+                        descriptors[file_index] = os.open(self.files[file_index], os.O_RDONLY)
+                    for subimage, values in CompressedFile.split_record(record, subimages, blocks[i, j]):
+                        tasks.append((descriptors[file_index], record, subimage, values))
+
+            if workers == 1:
+                for task in tasks:
+                    CompressedFile.decode_subimage(*task)
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    # Consume the results so that any exception is raised here
+                    list(executor.map(lambda task: CompressedFile.decode_subimage(*task), tasks))
+        finally:
+            for fd in descriptors.values():
+                os.close(fd)
+
+        if single:
+            return blocks[0]
+        return {(field if isinstance(field, str) else self.format[field]): blocks[i] for i, field in enumerate(fields)}
+
+    def extract_modes(self, *args):
+        """
+        Extract the modes of the simulation. Note that these modes should be specified as (n, m, l), where l is the positive integer x-directional mode number, and m and n are the (not necessarily positive) integer y- and z-directional mode numbers. This is to be consistent with PADDI's choice of the "real" axis when taking the FFT.
+
+        :type args: :class:`tuple` of 3 :class:`int`
+        :param args: Any number of triples that can represent modes; note that a negative x mode number will index backwards as usual and so will correspond to a high spatial frequency
+
+        :rtype: :class:`dict` with :class:`str` keys and :class:`dict` values with :class:`tuple` of 3 :class:`int` keys and :class:`list` of :class:`complex` values
+        :return: A dictionary, keyed by the string representation of the field, whose values are themselves dictionaries that have mode number tuple keys and time series values of the complex amplitudes of those modes
+        """
+        modes = {}
+
+        # Iterate over the files
+        for file_name in self.files:
+            with CompressedFile(file_name) as file:
+                while (True):
+                    # Read each compressed entry
+                    try:
+                        magic, data, iteration, time, dt = file.read()
+                    except EOFError:
+                        break
+
+                    # Perform the fft, using the last axis as the "real" axis
+                    data = np.fft.rfftn(data / data.size)
+
+                    # Iterate over the modes and extract the relevant ones to return
+                    for mode in args:
+                        if self.format[magic] not in modes:
+                            modes[self.format[magic]] = {}
+                        if mode not in modes[self.format[magic]]:
+                            modes[self.format[magic]][mode] = []
+                        modes[self.format[magic]][mode].append(data[mode])
+
+        return modes
+
+    def to_netcdf(self, *args, **kwargs):
+        """
+        Convert the compressed data into a netcdf file (effectively, use this to reconstruct a lower resolution simdat file). This method can also be used to easily "uncompress" the file, but this is not recommended as it is likely to be quite large.
+
+        :param args: Passed to :class:`netCDF4.Dataset` constructor
+        :param kwargs: Passed to :class:`netCDF4.Dataset` constructor
+
+        :rtype: :class:`netCDF4.Dataset`
+        :return: The netcdf file object associated with the newly created file
+        """
+        # Construct the dataset
+        obj = nc.Dataset(mode="w", *args, **kwargs)
+
+        # Create the dimensions
+        time = obj.createDimension("time", None)
+        z = obj.createDimension("Z", self.shape[0])
+        y = obj.createDimension("Y", self.shape[1])
+        x = obj.createDimension("X", self.shape[2])
+
+        # Add a variable for each key in the format
+        for key in self.format:
+            obj.createVariable(self.format[key], "f4", ("time", "Z", "Y", "X"))
+
+        # Decode each snapshot into the same buffer and record it
+        data = np.empty(self.shape, dtype=np.float32)
+        for (index, magic) in sorted(self.lookup):
+            if magic in self.format:
+                obj[self.format[magic]][index] = self.read(index, magic, out=data)
+
+        return obj
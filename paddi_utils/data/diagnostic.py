@@ -1,4 +1,9 @@
 import glob
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 import numpy as np
 import pandas as pd
@@ -27,6 +32,16 @@ class Diagnostic(pd.DataFrame):
     :param files: A list of diagnostic file names to open in time order
     :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
     :param format: The column--type pairs of the data to be read from the diagnostic file; if `None`, instead use :attr:`Diagnostic.default_format`
+    :type columns: :class:`list` of :class:`str`
+    :param columns: The columns to load, named as by :func:`Diagnostic.column_names`; if `None`, load every column in format
+    :type stride: :class:`int`
+    :param stride: If given, keep only every stride-th row of each file, starting from its first
+    :type t_range: :class:`tuple` of 2 :class:`float`
+    :param t_range: If given, keep only the rows with times in the inclusive range (t0, t1); either end may be `None`. The times are assumed to increase within each file, so that the parts of a file outside the range need not be parsed
+    :type cache: :class:`bool`
+    :param cache: If `True`, keep a columnar cache of each file next to it (see :func:`Diagnostic.cache_name`), so that later loads of an unchanged file read only the requested columns. A current cache is used for any selection, but it is only written when every row is read, so that a stride or t_range parses only the selected rows of a file that is not cached
+    :type workers: :class:`int`
+    :param workers: The maximum number of processes used to parse files that are not cached; by default, 1, parse them in this process, and if `None`, use one per processor. A pool of processes must be started from code under an ``if __name__ == "__main__":`` guard on platforms that spawn rather than fork new processes
     """
 
     default_format = [("istep", np.int),
@@ -66,23 +81,395 @@ class Diagnostic(pd.DataFrame):
                       ("diss_Chem", np.float)]
     """The default format of a diagnostic file, given as a list of column--type pairs"""
 
-    def __init__(self, files, format=None):
+    _metadata = ["parameters", "files", "format", "stride", "t_range", "offsets", "rows", "lengths"]
+
+    chunk_size = 2 ** 24
+    """The number of bytes read from disk at a time when parsing files"""
+
+    _special_line = re.compile(rb"\n[ \t\r]*(#[^\n]*)?(?=\n)")
+
+    def __init__(self, files, format=None, columns=None, stride=1, t_range=None, cache=True, workers=1):
         if format is None:
             format = Diagnostic.default_format
 
-        # Construct an array from each file
-        file_data = []
-        for file_name in files:
-            array = np.genfromtxt(file_name, dtype=format)
-            file_data.append(pd.DataFrame(array))
-
-        # If more than one array was constructed, concatenate the arrays
-        if len(file_data) > 1:
-            super(Diagnostic, self).__init__(pd.concat(file_data))
-        elif len(file_data) == 1:
-            super(Diagnostic, self).__init__(file_data[0])
+        if columns is None:
+            columns = Diagnostic.column_names(format)
+
+        # Load what we can from the caches, and parse the remaining files, in parallel if asked
+        results = [None] * len(files)
+        if cache:
+            results = [Diagnostic.load_cache(file_name, format=format, columns=columns, stride=stride, t_range=t_range) for file_name in files]
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        parse = partial(Diagnostic.parse_file, format=format, columns=columns, stride=stride, t_range=t_range, cache=cache)
+        if len(missing) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for i, result in zip(missing, pool.map(parse, [files[i] for i in missing])):
+                    results[i] = result
+        else:
+            for i in missing:
+                results[i] = parse(files[i])
+
+        # Concatenate the columns, keeping the row numbers within each file as the index
+        if len(results) > 0:
+            super(Diagnostic, self).__init__(Diagnostic.frame_from_columns([(data, index) for data, index, end, rows in results], columns))
         else:
             super(Diagnostic, self).__init__()
 
+        # Record how far each file has been read, so that it can be followed with refresh
+        self.files = list(files)
+        self.format = format
+        self.stride = stride
+        self.t_range = t_range
+        self.offsets = [end for data, index, end, rows in results]
+        self.rows = [rows for data, index, end, rows in results]
+        self.lengths = [len(index) for data, index, end, rows in results]
+
         # Gather parameters from the first file
         self.parameters = Parameters.from_header(files[0])
+
+    def refresh(self, files=None):
+        """
+        Read any lines appended to the files since they were last read, and add them to the end of this object in place. Only the new lines are parsed, and a final line that is still being written is left for the next refresh. Files that are new to this object (e.g., from a restart) are read in full. If a file has shrunk (e.g., it has been overwritten), every file is read again.
+
+        :type files: :class:`list` of :class:`str`
+        :param files: The files to read in time order, which should start with the files already read; if `None`, use the same files as before
+
+        :rtype: :class:`int`
+        :return: The change in the number of rows
+        """
+        if files is None:
+            files = self.files
+
+        columns = list(self.columns)
+        length = len(self)
+
+        # If the earlier files are not unchanged apart from new lines, start from scratch
+        if (list(files[:len(self.files)]) != self.files
+                or any(os.stat(file_name).st_size < offset for file_name, offset in zip(self.files, self.offsets))):
+            self._reload(files, columns)
+            return len(self) - length
+
+        # Parse only the new lines, noting where the rows of each file end so that the new rows can be inserted after them
+        pieces = []
+        start = 0
+        for i, file_name in enumerate(files):
+            offset, rows, kept = (self.offsets[i], self.rows[i], self.lengths[i]) if i < len(self.files) else (0, 0, 0)
+            start += kept
+
+            data, index, end, rows = self.parse_file(file_name, format=self.format, columns=columns, stride=self.stride, t_range=self.t_range,
+                                                     offset=offset, row=rows)
+            if len(index) > 0:
+                pieces.append((start, pd.DataFrame(data, index=index, columns=columns)))
+
+            if i < len(self.files):
+                self.offsets[i], self.rows[i], self.lengths[i] = end, rows, kept + len(index)
+            else:
+                self.files.append(file_name)
+                self.offsets.append(end)
+                self.rows.append(rows)
+                self.lengths.append(len(index))
+
+        if pieces:
+            # Split the rows already read only where new rows go, which is usually just at the end, so that the new rows are appended
+            frames = []
+            done = 0
+            for position, frame in pieces:
+                frames += [self.iloc[done:position], frame]
+                done = position
+            frames.append(self.iloc[done:])
+            super(Diagnostic, self).__init__(pd.concat(frames))
+
+        return len(self) - length
+
+    def follow(self, interval=60.0, pattern=None):
+        """
+        Poll the files for new output indefinitely, refreshing this object whenever there is some. This is a generator, for use with running simulations::
+
+            diagnostic = Diagnostic(sorted(glob.glob("OUT*")))
+            for added in diagnostic.follow(300.0, "OUT*"):
+                # Update the plots with the new rows
+                ...
+
+        :type interval: :class:`float`
+        :param interval: The time in seconds to wait between polls
+        :type pattern: :class:`str`
+        :param pattern: If given, a glob pattern used to find the files (e.g., new restart files) on each poll; otherwise, follow the same files
+
+        :rtype: generator of :class:`int`
+        :return: The change in the number of rows, each time it is nonzero
+        """
+        while True:
+            added = self.refresh(sorted(glob.glob(pattern)) if pattern is not None else None)
+            if added != 0:
+                yield added
+            time.sleep(interval)
+
+    def _reload(self, files, columns):
+        # Read the files from scratch and replace the contents of this object
+        result = Diagnostic(files, format=self.format, columns=columns, stride=self.stride, t_range=self.t_range)
+        super(Diagnostic, self).__init__(result)
+        for name in ["files", "offsets", "rows", "lengths"]:
+            setattr(self, name, getattr(result, name))
+
+    @staticmethod
+    def frame_from_columns(file_data, columns):
+        """
+        Concatenate the columns read from a sequence of files into a frame, indexed by the row numbers within each file (so that, as with :func:`pandas.concat`, the index of each file starts again from 0).
+
+        :type file_data: :class:`list` of :class:`tuple` of the form (:class:`dict` of :class:`numpy.ndarray` with :class:`str` keys, :class:`numpy.ndarray`)
+        :param file_data: The contents of each column and the row numbers for each file
+        :type columns: :class:`list` of :class:`str`
+        :param columns: The names of the columns, in order
+
+        :rtype: :class:`pandas.DataFrame`
+        :return: The concatenated frame
+        """
+        index = np.concatenate([index for data, index in file_data])
+        return pd.DataFrame({name: np.concatenate([data[name] for data, index in file_data]) for name in columns},
+                            index=index, columns=columns)
+
+    @staticmethod
+    def column_names(format):
+        """
+        Return the names of the columns for a format. As with :func:`numpy.genfromtxt`, characters that are not valid in identifiers are dropped (e.g., "u_min(1)" becomes "u_min1").
+
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The column--type pairs of the data
+
+        :rtype: :class:`list` of :class:`str`
+        :return: The names of the columns
+        """
+        return [re.sub(r"\W", "", name.strip().replace(" ", "_")) for name, dtype in format]
+
+    @staticmethod
+    def select_rows(data, index, columns, stride=1, t_range=None):
+        """
+        Select rows and columns from data that have already been read.
+
+        :type data: :class:`dict` of :class:`numpy.ndarray` with :class:`str` keys
+        :param data: The contents of each column; this must include "t" if t_range is given
+        :type index: :class:`numpy.ndarray`
+        :param index: The row numbers of the data within the file
+        :type columns: :class:`list` of :class:`str`
+        :param columns: The columns to keep
+        :type stride: :class:`int`
+        :param stride: Keep only the rows whose row number is a multiple of stride
+        :type t_range: :class:`tuple` of 2 :class:`float`
+        :param t_range: If given, keep only the rows with times in the inclusive range (t0, t1); either end may be `None`
+
+        :rtype: :class:`dict` of :class:`numpy.ndarray` with :class:`str` keys, :class:`numpy.ndarray`
+        :return: The selected contents of each column and their row numbers
+        """
+        mask = index % stride == 0
+        if t_range is not None:
+            t0, t1 = t_range
+            if t0 is not None:
+                mask &= data["t"] >= t0
+            if t1 is not None:
+                mask &= data["t"] <= t1
+
+        if mask.all():
+            return {name: data[name] for name in columns}, index
+
+        return {name: data[name][mask] for name in columns}, index[mask]
+
+    @classmethod
+    def parse_file(cls, file_name, format=None, columns=None, stride=1, t_range=None, cache=False, offset=0, row=0):
+        """
+        Parse a diagnostic file in chunks, starting from the line at a given byte offset. Comment and blank lines are ignored, as is a final line that has not been completely written.
+
+        Only the selected rows are parsed, and only the requested columns are kept, so the time and memory used scale with the selection. The times are assumed to increase within the file, so the chunks of the file before t_range are only counted, not parsed, and reading stops at the first line after t_range.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the diagnostic file
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The column--type pairs of the data to be read from the diagnostic file; if `None`, instead use :attr:`Diagnostic.default_format`
+        :type columns: :class:`list` of :class:`str`
+        :param columns: The columns to return; if `None`, return every column in format
+        :type stride: :class:`int`
+        :param stride: Keep only the rows whose row number is a multiple of stride
+        :type t_range: :class:`tuple` of 2 :class:`float`
+        :param t_range: If given, keep only the rows with times in the inclusive range (t0, t1); either end may be `None`
+        :type cache: :class:`bool`
+        :param cache: If `True`, reading from the start of the file, and selecting every row (i.e., without stride or t_range), parse every column and write them to the cache file given by :func:`Diagnostic.cache_name`
+        :type offset: :class:`int`
+        :param offset: The byte offset of the first line to read
+        :type row: :class:`int`
+        :param row: The row number of the first line to read
+
+        :rtype: :class:`dict` of :class:`numpy.ndarray` with :class:`str` keys, :class:`numpy.ndarray`, :class:`int`, :class:`int`
+        :return: The contents of each column, the row numbers of the rows read, the byte offset after the last line read, and the number of lines read (including those that were skipped)
+        """
+        if format is None:
+            format = cls.default_format
+
+        names = cls.column_names(format)
+        if columns is None:
+            columns = names
+
+        stat = os.stat(file_name)
+
+        # To write the cache, read everything and then select the columns; each line is parsed whole either way, so only a selection of rows is worth parsing on its own
+        if cache and offset == 0 and stride == 1 and t_range is None:
+            data, index, end, rows = cls.parse_file(file_name, format=format)
+            cls.save_cache(file_name, (stat.st_size, stat.st_mtime_ns, end, rows), data, format=format)
+            data, index = cls.select_rows(data, index, columns, stride=stride, t_range=t_range)
+            return data, index, end, rows
+
+        if t_range is not None and "t" not in names:
+            raise ValueError("Selecting by time requires a \"t\" column")
+
+        t0, t1 = t_range if t_range is not None else (None, None)
+        t_column = names.index("t") if "t" in names else None
+        dtypes = {name: dtype for name, (key, dtype) in zip(names, format)}
+        keep = {name: names.index(name) for name in columns}
+
+        pieces = {name: [] for name in columns}
+        indices = []
+        end = offset
+        with open(file_name, "rb") as file:
+            file.seek(offset)
+            remaining = stat.st_size - offset
+            remainder = b""
+            while remaining > 0:
+                chunk = file.read(min(cls.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+
+                # Only process complete lines; the remainder is carried into the next chunk
+                buf = remainder + chunk
+                cut = buf.rfind(b"\n") + 1
+                remainder = buf[cut:]
+
+                # Strip the comment and blank lines (starting from a virtual newline)
+                lines = cls._special_line.sub(b"", b"\n" + buf[:cut])[1:]
+                ends = np.flatnonzero(np.frombuffer(lines, dtype=np.uint8) == ord("\n")) + 1
+                starts = np.concatenate([[0], ends[:-1]])
+
+                if len(ends) > 0 and t1 is not None and cls._line_time(lines, 0, t_column) > t1:
+                    break
+
+                numbers = row + np.arange(len(ends))
+                end += cut
+                row += len(ends)
+
+                if len(ends) == 0 or (t0 is not None and cls._line_time(lines, starts[-1], t_column) < t0):
+                    continue
+
+                # Gather the selected lines and parse them in one pass
+                selected = numbers % stride == 0
+                if not selected.all():
+                    lines = b"".join([lines[i:j] for i, j in zip(starts[selected].tolist(), ends[selected].tolist())])
+                    numbers = numbers[selected]
+
+                if len(numbers) == 0:
+                    continue
+
+                values = np.fromstring(lines, dtype=np.float64, sep=" ")
+                if values.size != len(numbers) * len(format):
+                    raise ValueError("Malformed data in %s" % file_name)
+
+                values = values.reshape((-1, len(format)))
+                if t_range is not None:
+                    mask = np.ones(len(numbers), dtype=bool)
+                    if t0 is not None:
+                        mask &= values[:, t_column] >= t0
+                    if t1 is not None:
+                        mask &= values[:, t_column] <= t1
+                    values = values[mask]
+                    numbers = numbers[mask]
+
+                for name in columns:
+                    pieces[name].append(values[:, keep[name]].astype(dtypes[name]))
+                indices.append(numbers)
+
+        data = {name: np.concatenate(pieces[name]) if len(pieces[name]) > 0 else np.empty(0, dtype=dtypes[name]) for name in columns}
+        index = np.concatenate(indices) if len(indices) > 0 else np.empty(0, dtype=np.int64)
+
+        return data, index, end, row
+
+    @staticmethod
+    def _line_time(lines, start, t_column):
+        # Parse the time from the line starting at the given offset
+        return float(lines[start:lines.index(b"\n", start)].split()[t_column])
+
+    @staticmethod
+    def cache_name(file_name):
+        """
+        Return the name of the columnar cache for a diagnostic file. This is a hidden, uncompressed ".npz" file in the same directory with one array per column, so that each column can be loaded on its own.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the diagnostic file
+
+        :rtype: :class:`str`
+        :return: The name of the cache file
+        """
+        directory, base = os.path.split(file_name)
+        return os.path.join(directory, "." + base + ".columns.npz")
+
+    @classmethod
+    def load_cache(cls, file_name, format=None, columns=None, stride=1, t_range=None):
+        """
+        Load columns from the cache of a diagnostic file, if the cache was written from the file at its current size and modification time with the same format.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the diagnostic file
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The column--type pairs of the data to be read from the diagnostic file; if `None`, instead use :attr:`Diagnostic.default_format`
+        :type columns: :class:`list` of :class:`str`
+        :param columns: The columns to load; if `None`, load every column in format
+        :type stride: :class:`int`
+        :param stride: Keep only the rows whose row number is a multiple of stride
+        :type t_range: :class:`tuple` of 2 :class:`float`
+        :param t_range: If given, keep only the rows with times in the inclusive range (t0, t1); either end may be `None`
+
+        :rtype: :class:`tuple` as from :func:`Diagnostic.parse_file`, or `None`
+        :return: The contents of each column, their row numbers, the byte offset of the end of the data, and the number of rows in the file, or `None` if there is no current cache
+        """
+        if format is None:
+            format = cls.default_format
+
+        if columns is None:
+            columns = cls.column_names(format)
+
+        stat = os.stat(file_name)
+        try:
+            with np.load(cls.cache_name(file_name)) as cache:
+                size, mtime, end, rows = cache["__stats__"]
+                if (size, mtime) != (stat.st_size, stat.st_mtime_ns) or str(cache["__format__"]) != repr(np.dtype(format).descr):
+                    return None
+                data = {name: cache[name] for name in set(columns) | ({"t"} if t_range is not None else set())}
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+
+        data, index = cls.select_rows(data, np.arange(rows), columns, stride=stride, t_range=t_range)
+        return data, index, int(end), int(rows)
+
+    @classmethod
+    def save_cache(cls, file_name, stats, data, format=None):
+        """
+        Write the columnar cache of a diagnostic file. If the cache cannot be written (e.g., the directory is read-only), nothing is done.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the diagnostic file
+        :type stats: :class:`tuple` of 4 :class:`int`
+        :param stats: The size and modification time (in ns) of the file from before it was read, the byte offset of the end of the data, and the number of rows
+        :type data: :class:`dict` of :class:`numpy.ndarray` with :class:`str` keys
+        :param data: The contents of every column in format
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The column--type pairs of the data; if `None`, instead use :attr:`Diagnostic.default_format`
+        """
+        if format is None:
+            format = cls.default_format
+
+        cache_name = cls.cache_name(file_name)
+        temp_name = "%s.%i.tmp" % (cache_name, os.getpid())
+        try:
+            with open(temp_name, "wb") as file:
+                np.savez(file, __stats__=np.array(stats, dtype=np.int64), __format__=repr(np.dtype(format).descr), **data)
+            os.replace(temp_name, cache_name)
+        except (IOError, OSError):
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
@@ -1,7 +1,11 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import netCDF4 as nc
+import scipy.fft
 
-from paddi_utils.data.diagnostic import Parameters
+from paddi_utils.data.parameters import Parameters
 
 class Dump(nc.Dataset):
     """
@@ -30,24 +34,42 @@ class Dump(nc.Dataset):
 
         dump.close()
     
-    :type parameters: :class:`parameters.Parameters`
-    :param parameters: The input parameters to initiate a new dump file (raises a RuntimeError if this does not match those in an existing file, if provided)
+    :type parameters: :class:`parameters.Parameters` or `None`
+    :param parameters: The input parameters to initiate a new dump file (raises a RuntimeError if this does not match those in an existing file, if provided); these can only be `None` when opening an existing file
     :type file_name: :class:`str`
     :param file_name: The name of the file to open; if `None`, instead use parameters["name_of_input_restart_file"]
     :type mode: :class:`str`
     :param mode: "r" to read, "w" to write, or "a" to edit
+    :type format: :class:`str`
+    :param format: The netCDF format of a new file; PADDI reads "NETCDF3_64BIT", but "NETCDF4" files are chunked and compressed (see :func:`Dump.create_field`), which suits archives and analysis, and can be converted back with :func:`Dump.convert`
+    :type complevel: :class:`int` or `None`
+    :param complevel: The zlib compression level of the fields of a new "NETCDF4" file; if `None`, use :attr:`Dump.complevel`
+    :type chunksizes: :class:`tuple` of :class:`int` or `None`
+    :param chunksizes: The chunk shape of the fields of a new "NETCDF4" file; if `None`, use one y mode ("m") per chunk
     :param args: Passed to :class:`nc.Dataset` constructor
     :param kwargs: Passed to :class:`nc.Dataset` constructor
     """
 
-    def __init__(self, parameters, file_name=None, mode="w", *args, **kwargs):
+    complevel = 4
+    """The default zlib compression level of the fields in "NETCDF4" dump files"""
+
+    slab_size = 2 ** 26
+    """The default size in bytes of a slab of a field written by :func:`Dump.fill`"""
+
+    def __init__(self, parameters=None, file_name=None, mode="w", *args, format="NETCDF3_64BIT", complevel=None, chunksizes=None, **kwargs):
+        if parameters is None and (file_name is None or mode == "w"):
+            raise ValueError("Parameters are needed to create a new dump file")
+
         if file_name is None:
             file_name = parameters["name_of_input_restart_file"] + ".cdf"
 
-        super(Dump, self).__init__(file_name, mode=mode, format="NETCDF3_64BIT", *args, **kwargs)
+        super(Dump, self).__init__(file_name, mode=mode, format=format, *args, **kwargs)
+
+        # Setting an attribute of a netCDF4.Dataset writes a netCDF attribute, so keep the mode as a Python attribute through __dict__
+        self.__dict__["open_mode"] = mode
 
         # Several variables need to exist in a new dump file, so generate them if needed
-        if mode is "w":
+        if mode == "w":
             # Create the dimensions for the file
             kx = self.createDimension("l", parameters["max_degree_of_x_fourier_modes"] + 1)
             ky = self.createDimension("m", parameters["max_degree_of_y_fourier_modes"] * 2)
@@ -56,13 +78,8 @@ class Dump(nc.Dataset):
 
             # Copy some of the parameters into the file
             for parameter in parameters:
-                # Attempt to scrape the type information from the parameters object
-                # Otherwise, use the given type of the parameter
-                dtypes = [dtype for name, dtype in parameters.format if name == parameter]
-                if len(dtypes) > 0:
-                    dtype = dtypes[0]
-                else:
-                    dtype = type(parameters[parameter])
+                # Use the type information from the parameters object, or otherwise the type of the parameter
+                dtype = parameters.dtype(parameter)
 
                 # Several parameters have different names in the parameters and dump files
                 # The translation is performed here
@@ -104,8 +121,8 @@ class Dump(nc.Dataset):
 
             # Create the relevant fields
             for var in ["Chem", "Temp", "ux", "uy", "uz"]:
-                self.createVariable(var, "f8", ("m", "l", "n", "ri"))
-        else:
+                self.create_field(self, var, "f8", ("m", "l", "n", "ri"), complevel=complevel, chunksizes=chunksizes)
+        elif parameters is not None:
             # There is an existing file already, so just open it and check that the parameters match
             for parameter in parameters:
                 if parameter in Parameters.param_translation:
@@ -113,27 +130,262 @@ class Dump(nc.Dataset):
                         raise RuntimeError("Parameter mismatch in dump file construction")
 
     @classmethod
-    def from_file(cls, file_name):
+    def create_field(cls, dataset, name, datatype, dimensions, complevel=None, chunksizes=None):
+        """
+        Create a variable for a field. In a "NETCDF4" file, the field is compressed losslessly (zlib with the byte shuffle filter) and chunked; by default each chunk is one y mode ("m"), which is the slab read and written by :func:`Dump.fill`. A kz column at fixed l and m then lies within a single chunk, but a read at fixed (l, n) across every m, such as a single kz column of every y mode, touches (and decompresses) every chunk; pass chunksizes to suit such reads. In a "NETCDF3" file, this is just :func:`netCDF4.Dataset.createVariable`.
+
+        :type dataset: :class:`netCDF4.Dataset`
+        :param dataset: The file in which to create the field
+        :type name: :class:`str`
+        :param name: The name of the field
+        :type datatype: :class:`str`
+        :param datatype: The netCDF data type of the field
+        :type dimensions: :class:`tuple` of :class:`str`
+        :param dimensions: The names of the dimensions of the field
+        :type complevel: :class:`int` or `None`
+        :param complevel: The zlib compression level; if `None`, use :attr:`Dump.complevel`
+        :type chunksizes: :class:`tuple` of :class:`int` or `None`
+        :param chunksizes: The chunk shape; if `None`, use one index of the first dimension per chunk
+
+        :rtype: :class:`netCDF4.Variable`
+        :return: The new variable
+        """
+        if not dataset.data_model.startswith("NETCDF4") or len(dimensions) == 0:
+            return dataset.createVariable(name, datatype, dimensions)
+
+        if complevel is None:
+            complevel = cls.complevel
+        if chunksizes is None:
+            chunksizes = (1,) + tuple(len(dataset.dimensions[dimension]) for dimension in dimensions[1:])
+
+        return dataset.createVariable(name, datatype, dimensions, zlib=complevel > 0, complevel=complevel, shuffle=True, chunksizes=chunksizes)
+
+    @classmethod
+    def convert(cls, file_name, new_file_name, format="NETCDF4", complevel=None, chunksizes=None):
+        """
+        Convert a dump file between formats, e.g. to compress an archived restart file, or to turn a compressed file back into one that PADDI can read::
+
+            Dump.convert("dump.cdf", "dump.nc4").close()
+            Dump.convert("dump.nc4", "dump.cdf", format="NETCDF3_64BIT").close()
+
+        The fields are copied one y mode ("m") at a time, so the files are never held in memory.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the file to convert
+        :type new_file_name: :class:`str`
+        :param new_file_name: The name of the new file
+        :type format: :class:`str`
+        :param format: The netCDF format of the new file
+        :type complevel: :class:`int` or `None`
+        :param complevel: The zlib compression level of the fields of a "NETCDF4" file; if `None`, use :attr:`Dump.complevel`
+        :type chunksizes: :class:`tuple` of :class:`int` or `None`
+        :param chunksizes: The chunk shape of the fields of a "NETCDF4" file; if `None`, use one y mode ("m") per chunk
+
+        :rtype: :class:`Dump`
+        :return: An editable :class:`Dump` object associated with the new file
+        """
+        with nc.Dataset(file_name) as data:
+            with nc.Dataset(new_file_name, mode="w", format=format) as obj:
+                for name, dimension in data.dimensions.items():
+                    obj.createDimension(name, None if dimension.isunlimited() else len(dimension))
+                obj.setncatts({name: data.getncattr(name) for name in data.ncattrs()})
+
+                for name, variable in data.variables.items():
+                    if len(variable.dimensions) > 1:
+                        new = cls.create_field(obj, name, variable.dtype, variable.dimensions, complevel=complevel, chunksizes=chunksizes)
+                    else:
+                        new = obj.createVariable(name, variable.dtype, variable.dimensions)
+                    new.setncatts({key: variable.getncattr(key) for key in variable.ncattrs()})
+
+                    # Copy the fields slab by slab and everything else at once
+                    if len(variable.dimensions) > 1:
+                        for index in range(variable.shape[0]):
+                            new[index] = variable[index]
+                    else:
+                        new[...] = variable[...]
+
+        return cls.from_file(new_file_name)
+
+    @classmethod
+    def from_file(cls, file_name, mode="a"):
         """
-        Generate a :class:`Dump` object from a netCDF file
+        Generate a :class:`Dump` object from a netCDF file. The file is opened once and nothing is read but its header: the variables are loaded from disk slice by slice as they are indexed, and only the slices that are assigned to are written back. Opening even a very large restart file is therefore immediate.
 
         :type file_name: :class:`str`
         :param file_name: The name of the netCDF file to load
+        :type mode: :class:`str`
+        :param mode: "a" to edit the file, or "r" to open it read-only
 
         :rtype: :class:`Dump`
         :return: An editable :class:`Dump` object associated with the given file
         """
-        # Load a Dataset instance to be copied
-        data = nc.Dataset(file_name)
+        return cls(file_name=file_name, mode=mode)
+
+    def get_parameters(self):
+        """
+        Read the parameters stored in the file. Those of a file opened read-only are kept in :attr:`Parameters.cache`; those of a writable file are always read from the open file, so that they include any unsaved edits.
+
+        :rtype: :class:`parameters.Parameters`
+        :return: The parameters of the dump file
+        """
+        return Parameters.from_nc(self, cache=self.open_mode == "r")
+
+    def fill(self, fields, callback, slab=None, workers=None):
+        """
+        Fill fields of the file slab by slab along the y modes ("m"), so that no field is ever held in memory in full. For example, to start from small random perturbations::
+
+            shape = dump["Temp"].shape
+
+            def perturb(field, index):
+                return (np.random.random((index.stop - index.start,) + shape[1:]) - 0.5) * 1.0e-3
+
+            dump.fill(["Chem", "Temp"], perturb, workers=2)
+
+        With several workers, the fields are filled at the same time, one field per worker, and at most one slab per worker is held in memory. The callbacks then run concurrently, so they should not read from the file; the writes themselves are made one at a time, as the netCDF library is not thread-safe.
+
+        :type fields: :class:`str` or :class:`list` of :class:`str`
+        :param fields: The name of the field, or a list of names, to fill
+        :type callback: :class:`function`
+        :param callback: A function taking the name of the field and a :class:`slice` of the "m" dimension and returning the values of the field over that slab
+        :type slab: :class:`int` or `None`
+        :param slab: The number of y modes in each slab; if `None`, use as many as fit in :attr:`Dump.slab_size` bytes
+        :type workers: :class:`int` or `None`
+        :param workers: The number of threads to use; if 1, fill the fields in order in this thread, and if `None`, use one thread per field
+        """
+        if isinstance(fields, str):
+            fields = [fields]
+
+        variables = [self[field] for field in fields]
+        lock = threading.Lock()
+
+        def fill_field(field, variable):
+            length = variable.shape[0]
+            step = slab
+            if step is None:
+                step = max(1, self.slab_size // (variable.dtype.itemsize * int(np.prod(variable.shape[1:]))))
+
+            for start in range(0, length, step):
+                index = slice(start, min(start + step, length))
+                values = callback(field, index)
+                with lock:
+                    variable[index] = values
+
+        if workers == 1 or len(fields) == 1:
+            for field, variable in zip(fields, variables):
+                fill_field(field, variable)
+        else:
+            with ThreadPoolExecutor(max_workers=workers or len(fields)) as executor:
+                # Consume the results so that any exception is raised here
+                list(executor.map(fill_field, fields, variables))
+
+    def physical_shape(self):
+        """
+        Return the shape of the physical grid of the file as (z, y, x). This is the dealiased grid with three points per maximum mode degree in each direction, as in :class:`parameters.Parameters`.
+
+        :rtype: :class:`tuple` of :class:`int`
+        :return: The shape of the physical grid
+        """
+        return (3 * (len(self.dimensions["n"]) // 2), 3 * (len(self.dimensions["m"]) // 2), 3 * (len(self.dimensions["l"]) - 1))
+
+    def mode_slices(self, shape):
+        """
+        Match the ky and kz modes of the file to their places in the FFT of a physical grid. In the file, the modes 0 to kmax come first and kmin to -1 follow, as set up in the constructor; in the FFT, the negative modes are at the end of the axis.
+
+        :type shape: :class:`tuple` of :class:`int`
+        :param shape: The shape (z, y, x) of the physical grid
+
+        :rtype: :class:`list` of (:class:`slice`, :class:`slice`), :class:`list` of (:class:`slice`, :class:`slice`)
+        :return: The pairs of slices in the file and in the FFT for the y modes ("m") and for the z modes ("n")
+        """
+        nm, nn = len(self.dimensions["m"]), len(self.dimensions["n"])
+        ys = [(slice(0, nm // 2 + 1), slice(0, nm // 2 + 1)), (slice(nm // 2 + 1, nm), slice(shape[1] - nm // 2 + 1, shape[1]))]
+        zs = [(slice(0, nn // 2 + 1), slice(0, nn // 2 + 1)), (slice(nn // 2 + 1, nn), slice(shape[0] - nn // 2 + 1, shape[0]))]
+        return ys, zs
+
+    def padded_spectrum(self, field, shape):
+        """
+        Read a field into a complex array laid out as (z, y, x) for the FFT of a physical grid of the given shape. The real and imaginary parts are read as one complex number without a copy, and the ky and kz modes are placed at their positive and negative frequencies, with zeros in the dealiasing pad between them.
+
+        :type field: :class:`str`
+        :param field: The name of the field
+        :type shape: :class:`tuple` of :class:`int`
+        :param shape: The shape (z, y, x) of the physical grid
+
+        :rtype: :class:`numpy.ndarray`
+        :return: The complex spectrum of shape (z, y, x // 2 + 1)
+        """
+        nl = len(self.dimensions["l"])
+        spectrum = np.zeros((shape[0], shape[1], shape[2] // 2 + 1), dtype=np.complex128)
+
+        ys, zs = self.mode_slices(shape)
+
+        for m, y in ys:
+            data = np.ascontiguousarray(np.ma.getdata(self[field][m]), dtype=np.float64).view(np.complex128)[..., 0]
+            for n, z in zs:
+                spectrum[z, y, :nl] = data[:, :, n].transpose(2, 0, 1)
+
+        return spectrum
+
+    def to_physical(self, field, workers=None, shape=None, planes=None):
+        """
+        Transform a field to physical space with multithreaded real FFTs::
+
+            temp = dump.to_physical("Temp", workers=8)
+
+        To bound the memory, the result can instead be streamed a few z-planes at a time; only the spectrum itself is then held in full::
+
+            for z, planes in dump.to_physical("Temp", planes=16):
+                mean = planes.mean(axis=(1, 2))
 
-        # Grab the parameter information from the file
-        parameters = Parameters.from_nc(data)
+        :type field: :class:`str`
+        :param field: The name of the field
+        :type workers: :class:`int` or `None`
+        :param workers: The number of threads used by :mod:`scipy.fft`; if `None`, use one
+        :type shape: :class:`tuple` of :class:`int` or `None`
+        :param shape: The shape (z, y, x) of the physical grid; if `None`, use :func:`Dump.physical_shape`
+        :type planes: :class:`int` or `None`
+        :param planes: If given, return a generator over blocks of this many z-planes
 
-        # Generate a new Dump object
-        obj = cls(parameters, file_name=file_name, mode="a")
+        :rtype: :class:`numpy.ndarray` or generator of (:class:`slice`, :class:`numpy.ndarray`)
+        :return: The field on the physical grid with shape (z, y, x), or a generator of the slices in z and the blocks of planes
+        """
+        if shape is None:
+            shape = self.physical_shape()
+        spectrum = self.padded_spectrum(field, shape)
+
+        # The stored coefficients are the amplitudes of each mode, so the inverse transform is unnormalized
+        if planes is None:
+            return scipy.fft.irfftn(spectrum, s=shape, axes=(0, 1, 2), norm="forward", overwrite_x=True, workers=workers)
+
+        spectrum = scipy.fft.ifftn(spectrum, axes=(0, 1), norm="forward", overwrite_x=True, workers=workers)
+
+        def iter_planes():
+            for start in range(0, shape[0], planes):
+                z = slice(start, min(start + planes, shape[0]))
+                yield z, scipy.fft.irfft(spectrum[z], n=shape[2], axis=2, norm="forward", workers=workers)
+
+        return iter_planes()
+
+    def from_physical(self, field, array, workers=None):
+        """
+        Transform a field from physical space with multithreaded real FFTs and store it in the file. The modes that do not fit in the file (e.g., those in the dealiasing pad) are dropped.
+
+        :type field: :class:`str`
+        :param field: The name of the field
+        :type array: :class:`numpy.ndarray`
+        :param array: The field on the physical grid with shape (z, y, x)
+        :type workers: :class:`int` or `None`
+        :param workers: The number of threads used by :mod:`scipy.fft`; if `None`, use one
+        """
+        nm, nl, nn = len(self.dimensions["m"]), len(self.dimensions["l"]), len(self.dimensions["n"])
+        shape = array.shape
+        spectrum = scipy.fft.rfftn(array, axes=(0, 1, 2), norm="forward", workers=workers)
 
-        # Copy the contents of the Dataset into the object
-        for key in data.variables:
-            obj[key][:] = data[key][:]
+        # Gather the modes into the (m, l, n) layout, with the real and imaginary parts as the last axis
+        data = np.empty((nm, nl, nn), dtype=np.complex128)
+        ys, zs = self.mode_slices(shape)
+        for m, y in ys:
+            for n, z in zs:
+                data[m, :, n] = spectrum[z, y, :nl].transpose(1, 2, 0)
 
-        return obj
\ No newline at end of file
+        self[field][:] = data.view(np.float64).reshape((nm, nl, nn, 2))
@@ -1,7 +1,122 @@
+import copy
+import numbers
+import os
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
 import numpy as np
 import f90nml
 
-class Parameters(dict):
+class ParametersCache(object):
+    """
+    A process-wide, bounded least-recently-used cache of parsed parameters, used by the constructors of :class:`Parameters` so that loading many files from the same run parses its parameters only once. Entries are keyed by the path, modification time and size of the file (along with the arguments of the constructor), so a file that changes is parsed again. The cache is shared through :attr:`Parameters.cache`::
+
+        # Turn the cache off, or empty it
+        Parameters.cache.enabled = False
+        Parameters.cache.clear()
+
+        # Check how well the cache is working
+        print(Parameters.cache.hits, Parameters.cache.misses)
+
+    :type maxsize: :class:`int`
+    :param maxsize: The maximum number of entries to keep
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.enabled = True
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key(file_name, *args):
+        """
+        Return the key of the entry for a file, or `None` if the file cannot be found
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the file
+        :param args: Any further hashable values that the entry depends on
+
+        :rtype: :class:`tuple` or `None`
+        :return: The key for the entry
+        """
+        try:
+            stat = os.stat(file_name)
+        except (OSError, TypeError, ValueError):
+            return None
+        return (os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size) + args
+
+    @staticmethod
+    def copy_params(params):
+        """
+        Copy a set of parameters, so that the cache and its callers never share a mutable value. Scalars are immutable and so are shared, while any other value (e.g., a list from a namelist or an array from a netCDF file) is copied in full.
+
+        :type params: :class:`dict`
+        :param params: The parameters to copy
+
+        :rtype: :class:`dict`
+        :return: The copy
+        """
+        return {name: value if isinstance(value, (numbers.Number, str, bytes, np.generic, type(None))) else copy.deepcopy(value) for name, value in params.items()}
+
+    def get(self, key):
+        """
+        Return the parameters stored for a key, marking the entry as recently used
+
+        :type key: :class:`tuple` or `None`
+        :param key: The key, as from :func:`ParametersCache.key`
+
+        :rtype: :class:`dict` or `None`
+        :return: A copy of the stored parameters, or `None` if there are none (or the cache is disabled)
+        """
+        if not self.enabled or key is None:
+            return None
+        if key not in self.entries:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.copy_params(self.entries[key])
+
+    def put(self, key, params):
+        """
+        Store the parameters for a key, dropping the least recently used entries if the cache is full
+
+        :type key: :class:`tuple` or `None`
+        :param key: The key, as from :func:`ParametersCache.key`
+        :type params: :class:`dict`
+        :param params: The parameters to store
+        """
+        if not self.enabled or key is None:
+            return
+        self.entries[key] = self.copy_params(params)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Empty the cache and reset the counters
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """
+        Return the statistics of the cache
+
+        :rtype: :class:`dict`
+        :return: The numbers of hits and misses, the current size and the maximum size
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries), "maxsize": self.maxsize}
+
+class Parameters(MutableMapping):
     """
     Read the parameter information for the a PADDI run. This contains the parameters used for a particular run::
 
@@ -18,6 +133,8 @@ class Parameters(dict):
     :param kwargs: A dictionary containing parameter--value pairs
     """
 
+    __slots__ = ("format", "types", "values")
+
     default_format = [("thermal_buoyancy_param", np.float),
                       ("compositional_buoyancy_param", np.float),
                       ("viscous_diffusion_coeff", np.float),
@@ -71,13 +188,19 @@ class Parameters(dict):
     inv_translation = {value: key for key, value in param_translation.items()}
     """A dictionary that translates from the names in the netCDF files (keys) to those in the parameter file (values)"""
 
+    cache = ParametersCache()
+    """The cache of parsed parameters shared by :func:`Parameters.from_header`, :func:`Parameters.from_file` and :func:`Parameters.from_nc`"""
+
+    _format_types = {}
+
     def __init__(self, format=None, **kwargs):
         # Use the default format if none is given
         if format is None:
             format = Parameters.default_format
 
-        super(Parameters, self).__init__()
         self.format = format
+        self.types = self.format_types(format)
+        self.values = {}
 
         # Set some of the generally unprovided parameters
         self["istep"] = 0
@@ -120,14 +243,18 @@ class Parameters(dict):
         if format is None:
             format = cls.default_format
 
-        # Read the file, skipping the first skip lines
-        file = open(file_name, "r")
-        strings = [file.readline() for i in range(skip + len(format))][skip:]
+        key = cls.cache.key(file_name, "header", tuple(format), skip)
+        params = cls.cache.get(key)
+        if params is None:
+            # Read the file, skipping the first skip lines
+            with open(file_name, "r") as file:
+                strings = [file.readline() for i in range(skip + len(format))][skip:]
 
-        # Set the parameters sequentially based on the contents of the file header
-        params = {}
-        for line, (key, dtype) in zip(strings, format):
-            params[key] = dtype(line.split()[-1])
+            # Set the parameters sequentially based on the contents of the file header
+            params = {}
+            for line, (name, dtype) in zip(strings, format):
+                params[name] = dtype(line.split()[-1])
+            cls.cache.put(key, params)
 
         return cls(format=format, **params)
 
@@ -147,13 +274,17 @@ class Parameters(dict):
         if format is None:
             format = cls.default_format
 
-        file = open(file_name, "r")
-        params = f90nml.read(file)["input_values"]
+        key = cls.cache.key(file_name, "namelist")
+        params = cls.cache.get(key)
+        if params is None:
+            with open(file_name, "r") as file:
+                params = dict(f90nml.read(file)["input_values"])
+            cls.cache.put(key, params)
 
         return cls(format=format, **params)
 
     @classmethod
-    def from_nc(cls, dataset, format=None, translation=None):
+    def from_nc(cls, dataset, format=None, translation=None, cache=False):
         """
         Generate a :class:`Parameters` object from a given netCDF file.
 
@@ -163,6 +294,8 @@ class Parameters(dict):
         :param format: The parameter--type pairs of the data to be contained within the Parameters object; if `None`, instead use :attr:`Parameters.nc_format`
         :type translation: :class:`dict` of :class:`str` with :class:`str` as keys
         :param translation: The dictionary used to translate the variables in the netCDF file to parameter names for the :class:`Parameters` class with netCDF parameter names as values; if `None`, use :attr:`Parameters.param_translation`
+        :type cache: :class:`bool`
+        :param cache: If `True`, use :attr:`Parameters.cache`, keyed by the path, modification time and size of the file. Only pass this for a dataset opened read-only; the edits to a writable dataset are not on disk until it is synced or closed, so its cache entry could be stale, and by default the open dataset is always read
 
         :return type: :class:`Parameters`
         :return: An instance of the Parameters class build from the netCDF file
@@ -173,6 +306,17 @@ class Parameters(dict):
         if translation is None:
             translation = cls.param_translation
 
+        # The file path is unavailable if netCDF4 was built without support for it
+        key = None
+        if cache:
+            try:
+                key = cls.cache.key(dataset.filepath(), "nc")
+            except ValueError:
+                pass
+        params = cls.cache.get(key)
+        if params is not None:
+            return cls(format=cls.default_format, **params)
+
         params = {}
         for var in dataset.variables:
             if dataset[var].shape == tuple():
@@ -195,36 +339,95 @@ class Parameters(dict):
         params["initial_time_step_length"] = 0.0
         params["number_of_tasks_1st_transpose"] = 1
         params["number_of_tasks_2nd_transpose"] = 1
-        
+        cls.cache.put(key, params)
+
         return cls(format=cls.default_format, **params)
 
+    @classmethod
+    def format_types(cls, format):
+        """
+        Return the types of the parameters for a format, as a dictionary. These are computed once per format; the types from :attr:`Parameters.nc_format` are included for the parameters not in format.
+
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The parameter--type pairs
+
+        :rtype: :class:`dict` with :class:`str` keys and :class:`type` values
+        :return: The type of each parameter, keyed by name
+        """
+        key = tuple(format)
+        if key not in cls._format_types:
+            types = dict(cls.nc_format)
+            types.update(format)
+            cls._format_types[key] = types
+        return cls._format_types[key]
+
+    def dtype(self, index):
+        """
+        Return the type of a parameter: the type given in the format if there is one, and otherwise the type of its value
+
+        :type index: :class:`str`
+        :param index: The name of the parameter, or its name in the netCDF files
+
+        :rtype: :class:`type`
+        :return: The type of the parameter
+        """
+        index = self.inv_translation.get(index, index)
+        if index in self.types:
+            return self.types[index]
+        return type(self.values[index])
+
     def __getitem__(self, index):
         """
-        Return the item with the given key. If the item is not present, but is in :attr:`inv_translation`, use the corresponding translation key instead. This is designed to allow for consistent treatment of netCDF files and the :class:`Parameter` class.
+        Return the item with the given key. If the key is in :attr:`inv_translation`, use the corresponding translation key instead. This is designed to allow for consistent treatment of netCDF files and the :class:`Parameter` class.
 
         :type index: :class:`str`
         :param index: The key for which to get the corresponding value
 
         :return: The corresponding parameter value
         """
-        # If the index is in the translation dictionary, use that key instead
-        if index not in self and index in self.inv_translation:
-            index = self.inv_translation[index]
-
-        return super(Parameters, self).__getitem__(index)
+        return self.values[self.inv_translation.get(index, index)]
 
     def __setitem__(self, index, value):
         """
-        Return the item with the given key. If the item is not present, but is in :attr:`inv_translation`, use the corresponding translation key instead. This is designed to allow for consistent treatment of netCDF files and the :class:`Parameter` class.
+        Set the item with the given key. If the key is in :attr:`inv_translation`, use the corresponding translation key instead. Values of parameters with a known type (see :func:`Parameters.dtype`) are converted to that type where possible.
 
         :type index: :class:`str`
         :param index: The key to index
         :param value: The new value for the key
+        """
+        index = self.inv_translation.get(index, index)
+        dtype = self.types.get(index)
+        if dtype is not None and value is not None:
+            try:
+                value = dtype(value)
+            except (TypeError, ValueError):
+                pass
+        self.values[index] = value
 
-        :return: The corresponding parameter value
+    def __delitem__(self, index):
+        del self.values[self.inv_translation.get(index, index)]
+
+    def __contains__(self, index):
+        return self.inv_translation.get(index, index) in self.values
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.values)
+
+    def copy(self):
         """
-        # If the index is in the translation dictionary, use that key instead
-        if index not in self and index in self.inv_translation:
-            index = self.inv_translation[index]
+        Return a copy of the parameters
 
-        super(Parameters, self).__setitem__(index, value)
+        :rtype: :class:`Parameters`
+        :return: A new object with the same format and values
+        """
+        obj = type(self).__new__(type(self))
+        obj.format = self.format
+        obj.types = self.types
+        obj.values = dict(self.values)
+        return obj
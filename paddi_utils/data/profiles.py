@@ -1,12 +1,13 @@
+import os
+import hashlib
 from io import BytesIO
 import re
 from operator import itemgetter
 from itertools import groupby
 
 import numpy as np
-import pandas as pd
 
-from paddi_utils.data.diagnostic import Parameters
+from paddi_utils.data.parameters import Parameters
 
 class Profiles(np.ndarray):
     """
@@ -34,7 +35,15 @@ class Profiles(np.ndarray):
     :param sort_by: The indices to group and sort the file lines by, in order
     :type step_regex: :class:`str`
     :param step_regex: The regex string to use to extract the step and timestep information (needs two "captures")
+    :type idx: :class:`int`
+    :param idx: If given, load only the block with this index, counting across all files (negative values count from the end)
+    :type t_range: :class:`tuple` of 2 :class:`float`
+    :param t_range: If given, load only the blocks with times in the inclusive range (t0, t1); either end may be `None`
+    :type index: :class:`bool`
+    :param index: If `True`, keep a sidecar index of the block locations next to each file (see :func:`Profiles.index_blocks`), so that later loads need not scan the file
     :param args: Args passed to :class:`numpy.ndarray` constructor
+    :type cache: :class:`bool`
+    :param cache: If `True`, write a binary cache of the full history next to the first file (see :func:`Profiles.cache_name`) on the first load, and memory-map it on later loads until any of the files change; the data are then only read from disk as they are used
     :param kwargs: Keyword args passed to :class:`numpy.ndarray` constructor
     """
 
@@ -57,58 +66,618 @@ class Profiles(np.ndarray):
                       ("Chem_avg", np.float),]
     """The default format for a spectral output file. This can be overwritten if desired."""
 
-    def __new__(cls, files, format=default_format, sort_by=("z1",), step_regex="#Step=(.*),Time=(.*)", idx=None, *args, **kwargs):
-        times = []
-        timesteps = []
-        data = None
-        i = 0
-
-        # Iterate through the fiels
-        for file_name in files:
-            file_string = ""
+    chunk_size = 2 ** 24
+    """The number of bytes read from disk at a time when scanning and parsing files"""
 
-            # Go line by line
-            for line in open(file_name):
-                # When the end of a block is reached, log the results
-                if idx is not None and i > idx:
-                    break
+    block_dtype = np.dtype([("offset", np.int64),
+                            ("start", np.int64),
+                            ("end", np.int64),
+                            ("rows", np.int64),
+                            ("step", np.int64),
+                            ("time", np.float64)])
+    """The record type of a block table: the byte offset of the step header, the byte range of the data lines, the number of data lines, and the step and time from the header"""
 
-                if line.lstrip() is "":
-                    # Record the time and array information]
-                    time, timestep, array = cls.array_from_string(file_string, format=format, sort_by=sort_by, step_regex=step_regex)
-                    file_string = ""
+    # Matches a comment or blank line together with the newline before it, which lets the regex engine skip ahead to newlines
+    _special_line = re.compile(rb"\n[ \t\r]*(#[^\n]*)?(?=\n)")
 
-                    # Ignore empty blocks
-                    if array is None:
-                        continue
+    def __new__(cls, files, format=default_format, sort_by=("z1",), step_regex="#Step=(.*),Time=(.*)", idx=None, t_range=None, index=True, cache=False, *args, **kwargs):
+        data = None
 
-                    i += 1
-                    if idx is not None and idx != i - 1:
-                        continue
+        if cache:
+            # Use the binary cache of the full history if it is current; otherwise, read everything and write it
+            stats = cls.file_stats(files)
+            cached = cls.load_cache(files, stats, format=format, sort_by=sort_by, step_regex=step_regex)
+            if cached is None:
+                tables = [(file_name, cls.index_blocks(file_name, step_regex=step_regex, save=index)) for file_name in files]
+                if sum(len(table) for file_name, table in tables) > 0:
+                    data = cls.read_tables(tables, format=format, sort_by=sort_by)
+                    cls.save_cache(files, stats, data, tables, format=format, sort_by=sort_by, step_regex=step_regex)
+            else:
+                data, tables = cached
 
-                    times.append(time)
-                    timesteps.append(timestep)
+            selected = cls.select_blocks(tables, idx=idx, t_range=t_range)
+            if data is not None:
+                data = cls.take_blocks(data, tables, selected)
+            tables = selected
+        else:
+            # Look up the locations of the blocks in each file
+            tables = [(file_name, cls.index_blocks(file_name, step_regex=step_regex, save=index)) for file_name in files]
+            tables = cls.select_blocks(tables, idx=idx, t_range=t_range)
 
-                    if data is None:
-                        data = array
-                    else:
-                        data = np.concatenate([data, array])
-                else:
-                    file_string += line
+            if sum(len(table) for file_name, table in tables) > 0:
+                data = cls.read_tables(tables, format=format, sort_by=sort_by)
 
-        # If there are still no data, return an empty array
-        if data is None:
+        # If there are no data, return an empty array
+        if data is None or len(data) == 0:
             obj = np.ndarray.__new__(cls, [])
         else:
+            data = np.ascontiguousarray(data)
             obj = np.ndarray.__new__(cls, data.shape, dtype=data.dtype, buffer=data.data, *args, **kwargs)
 
         # Add the time and parameter information to the new class
-        obj.times = times
-        obj.timesteps = timesteps
+        obj.times = [time for file_name, table in tables for time in table["time"].tolist()]
+        obj.timesteps = [step for file_name, table in tables for step in table["step"].tolist()]
         obj.parameters = Parameters.from_header(files[0])
 
         return obj
 
+    @classmethod
+    def scan_blocks(cls, file_name, step_regex="#Step=(.*),Time=(.*)", chunk_size=None):
+        """
+        Scan a file once in chunks of chunk_size bytes and locate each block of data. A block is a run of data lines following a header comment and terminated by a blank line. Blocks without any data are ignored, as is a final block that has not yet been terminated by a blank line (e.g., one that is still being written).
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the file to scan
+        :type step_regex: :class:`str`
+        :param step_regex: The regex string to use to extract the step and timestep information (needs two "captures")
+        :type chunk_size: :class:`int`
+        :param chunk_size: The number of bytes to read at a time; if `None`, instead use :attr:`Profiles.chunk_size`
+
+        :rtype: :class:`numpy.ndarray` of :attr:`Profiles.block_dtype`
+        :return: The table of blocks in the file, in file order
+        """
+        if chunk_size is None:
+            chunk_size = cls.chunk_size
+
+        regex = re.compile(step_regex)
+
+        records = []
+        header = None
+        block = None
+        # Each buffer starts with the newline that ends the previous line, so the file starts with a virtual one
+        base = -1
+        remainder = b"\n"
+
+        def add_data(buf, pos, end):
+            # Extend the current block (or start a new one) with the data lines in buf[pos:end]
+            nonlocal block
+            if block is None:
+                block = [header, base + pos, base + end, 0]
+            block[2] = base + end
+            block[3] += buf.count(b"\n", pos, end)
+
+        def close_block():
+            # Parse the header of the current block and record it
+            header_offset, header_text = block[0] if block[0] is not None else (block[1], b"")
+            result = regex.search(header_text.decode().replace(" ", ""))
+            if result is None:
+                raise ValueError("Could not read the step information for the block at byte %i of %s" % (header_offset, file_name))
+
+            records.append((header_offset, block[1], block[2], block[3], int(result.groups()[0]), float(result.groups()[1])))
+
+        with open(file_name, "rb") as file:
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    break
+
+                # Only process complete lines; the remainder is carried into the next chunk
+                buf = remainder + chunk
+                cut = buf.rfind(b"\n")
+                remainder = buf[cut:]
+
+                # Step through the comment and blank lines; everything between them is data
+                pos = 1
+                for match in cls._special_line.finditer(buf, 0, cut + 1):
+                    start, end = match.start() + 1, match.end() + 1
+                    if start > pos:
+                        add_data(buf, pos, start)
+
+                    if match.group(1) is not None:
+                        # The last comment before the data is the header of the block
+                        if block is None:
+                            header = (base + start, match.group(1))
+                    elif block is not None:
+                        close_block()
+                        block = None
+                        header = None
+
+                    pos = end
+
+                if cut + 1 > pos:
+                    add_data(buf, pos, cut + 1)
+
+                base += cut
+
+        return np.array(records, dtype=cls.block_dtype)
+
+    @staticmethod
+    def index_name(file_name):
+        """
+        Return the name of the sidecar index file for a given data file. This is a hidden file in the same directory.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the data file
+
+        :rtype: :class:`str`
+        :return: The name of the index file
+        """
+        directory, base = os.path.split(file_name)
+        return os.path.join(directory, "." + base + ".blocks.npz")
+
+    @classmethod
+    def index_blocks(cls, file_name, step_regex="#Step=(.*),Time=(.*)", save=True):
+        """
+        Return the block table for a file, as from :func:`Profiles.scan_blocks`, using the sidecar index file given by :func:`Profiles.index_name` where possible. The index records the size and modification time of the file, and the file is only scanned again if either of these has changed. If the index cannot be written (e.g., the directory is read-only), the table is simply returned.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the file to index
+        :type step_regex: :class:`str`
+        :param step_regex: The regex string to use to extract the step and timestep information (needs two "captures")
+        :type save: :class:`bool`
+        :param save: If `False`, neither read nor write the sidecar index and scan the file directly
+
+        :rtype: :class:`numpy.ndarray` of :attr:`Profiles.block_dtype`
+        :return: The table of blocks in the file, in file order
+        """
+        if not save:
+            return cls.scan_blocks(file_name, step_regex=step_regex)
+
+        stat = os.stat(file_name)
+        index_name = cls.index_name(file_name)
+
+        # Use the existing index if it describes the file as it is now
+        try:
+            with np.load(index_name) as index:
+                if (index["size"] == stat.st_size and index["mtime"] == stat.st_mtime_ns
+                        and str(index["step_regex"]) == step_regex):
+                    return index["blocks"]
+        except (IOError, OSError, KeyError, ValueError):
+            pass
+
+        blocks = cls.scan_blocks(file_name, step_regex=step_regex)
+
+        # Write the new index atomically, so that concurrent readers never see a partial file
+        temp_name = "%s.%i.tmp" % (index_name, os.getpid())
+        try:
+            with open(temp_name, "wb") as file:
+                np.savez(file, blocks=blocks, size=stat.st_size, mtime=stat.st_mtime_ns, step_regex=step_regex)
+            os.replace(temp_name, index_name)
+        except (IOError, OSError):
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+
+        return blocks
+
+    @staticmethod
+    def select_blocks(tables, idx=None, t_range=None, every=1):
+        """
+        Select blocks from a sequence of block tables by index, by time, or at regular intervals.
+
+        :type tables: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`numpy.ndarray`)
+        :param tables: Pairs of file names and their block tables, in the order the files should be read
+        :type idx: :class:`int`
+        :param idx: If given, select only the block with this index, counting across all files (negative values count from the end)
+        :type t_range: :class:`tuple` of 2 :class:`float`
+        :param t_range: If given, select only the blocks with times in the inclusive range (t0, t1); either end may be `None`
+        :type every: :class:`int`
+        :param every: Of the blocks selected by idx and t_range, keep only every Nth, counting across all files and starting with the first
+
+        :rtype: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`numpy.ndarray`)
+        :return: Pairs of file names and contiguous slices of their block tables
+        """
+        if idx is not None:
+            if idx < 0:
+                idx += sum(len(table) for file_name, table in tables)
+
+            selected = []
+            count = 0
+            for file_name, table in tables:
+                if count <= idx < count + len(table):
+                    selected.append((file_name, table[idx - count:idx - count + 1]))
+                count += len(table)
+            tables = selected
+
+        if t_range is not None:
+            t0, t1 = t_range
+
+            selected = []
+            for file_name, table in tables:
+                mask = np.ones(len(table), dtype=bool)
+                if t0 is not None:
+                    mask &= table["time"] >= t0
+                if t1 is not None:
+                    mask &= table["time"] <= t1
+                selected.extend(Profiles._select_runs(file_name, table, mask))
+            tables = selected
+
+        if every > 1:
+            selected = []
+            count = 0
+            for file_name, table in tables:
+                mask = (count + np.arange(len(table))) % every == 0
+                count += len(table)
+                selected.extend(Profiles._select_runs(file_name, table, mask))
+            tables = selected
+
+        return tables
+
+    @staticmethod
+    def _select_runs(file_name, table, mask):
+        # Split the selection into runs of consecutive blocks
+        indices = np.flatnonzero(mask)
+        return [(file_name, table[run[0]:run[-1] + 1]) for run in np.split(indices, np.flatnonzero(np.diff(indices) != 1) + 1) if len(run) > 0]
+
+    @classmethod
+    def iter_blocks(cls, files, fields=None, every=1, format=default_format, sort_by=("z1",), step_regex="#Step=(.*),Time=(.*)", t_range=None, index=True, copy=False):
+        """
+        Iterate over the blocks of a sequence of files one at a time, without loading the full history. Blocks are read in batches of roughly :attr:`Profiles.chunk_size` bytes into a single buffer that is reused, so the memory used is bounded regardless of the length of the history::
+
+            import glob
+            from paddi_utils.data import Profiles
+
+            for step, time, frame in Profiles.iter_blocks(sorted(glob.glob("ZPROF*")), fields=["z1", "Temp"], every=10):
+                print(step, time, frame["Temp"].max())
+
+        :type files: :class:`list` of :class:`str`
+        :param files: A list of the file names to load, in the desired order to load them
+        :type fields: :class:`list` of :class:`str` or :class:`str`
+        :param fields: The fields to yield; if a single :class:`str`, yield a plain array of that field; if `None`, yield every field
+        :type every: :class:`int`
+        :param every: Yield only every Nth block, counting across all files
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The parameter--type pairs of the data to be read from the file
+        :type sort_by: :class:`tuple` of :class:`str`
+        :param sort_by: The indices to group and sort the file lines by, in order
+        :type step_regex: :class:`str`
+        :param step_regex: The regex string to use to extract the step and timestep information (needs two "captures")
+        :type t_range: :class:`tuple` of 2 :class:`float`
+        :param t_range: If given, yield only the blocks with times in the inclusive range (t0, t1); either end may be `None`
+        :type index: :class:`bool`
+        :param index: If `True`, use the sidecar index of each file (see :func:`Profiles.index_blocks`)
+        :type copy: :class:`bool`
+        :param copy: If `False`, the arrays yielded may share memory with the buffer and are only valid until the next iteration; if `True`, yield a copy of each block that can be kept
+
+        :rtype: generator of :class:`tuple` of the form (:class:`int`, :class:`float`, :class:`numpy.ndarray`)
+        :return: The step, the time, and the correctly shaped data array of each block
+        """
+        tables = [(file_name, cls.index_blocks(file_name, step_regex=step_regex, save=index)) for file_name in files]
+        tables = cls.select_blocks(tables, t_range=t_range, every=every)
+        tables = [(file_name, table) for file_name, table in tables if len(table) > 0]
+        if len(tables) == 0:
+            return
+
+        rows = tables[0][1]["rows"][0]
+        for file_name, table in tables:
+            if np.any(table["rows"] != rows):
+                raise ValueError("The blocks of %s do not all have %i rows" % (file_name, rows))
+
+        # Size the batches from the typical number of bytes in a block
+        size = max(np.mean(tables[0][1]["end"] - tables[0][1]["start"]), 1)
+        batch = max(1, int(cls.chunk_size // size))
+        buffer = np.empty((batch, rows), dtype=format)
+
+        for file_name, table in tables:
+            for i in range(0, len(table), batch):
+                blocks = table[i:i + batch]
+                cls.read_blocks(file_name, blocks, buffer[:len(blocks)])
+                data = cls.shape_blocks(buffer[:len(blocks)], sort_by)
+
+                if fields is not None:
+                    data = data[fields]
+
+                for step, time, block in zip(blocks["step"].tolist(), blocks["time"].tolist(), data):
+                    yield step, time, block.copy() if copy else block
+
+    @classmethod
+    def statistics(cls, files, fields=None, every=1, **kwargs):
+        """
+        Calculate the mean, minimum, and maximum over time of each field of a sequence of files. This streams over the blocks using :func:`Profiles.iter_blocks`, so it can be used on histories that do not fit in memory.
+
+        :type files: :class:`list` of :class:`str`
+        :param files: A list of the file names to load, in the desired order to load them
+        :type fields: :class:`list` of :class:`str` or :class:`str`
+        :param fields: The fields to reduce, or the name of a single field; if `None`, reduce every field
+        :type every: :class:`int`
+        :param every: Use only every Nth block, counting across all files
+        :param kwargs: Passed to :func:`Profiles.iter_blocks`
+
+        :rtype: :class:`int`, :class:`numpy.ndarray`, :class:`numpy.ndarray`, :class:`numpy.ndarray`
+        :return: The number of blocks used, and the mean, minimum, and maximum in time of each field as structured arrays shaped like a single block (`None` if there are no blocks)
+        """
+        # Keep a single field as a structured array, rather than the plain array that indexing by its name would give
+        if isinstance(fields, str):
+            fields = [fields]
+
+        count = 0
+        total = minimum = maximum = None
+        for step, time, block in cls.iter_blocks(files, fields=fields, every=every, **kwargs):
+            if total is None:
+                dtype = [(name, np.float64) for name in block.dtype.names]
+                total = np.zeros(block.shape, dtype=dtype)
+                minimum = np.empty(block.shape, dtype=dtype)
+                maximum = np.empty(block.shape, dtype=dtype)
+                for name in block.dtype.names:
+                    minimum[name] = block[name]
+                    maximum[name] = block[name]
+
+            for name in block.dtype.names:
+                total[name] += block[name]
+                np.minimum(minimum[name], block[name], out=minimum[name])
+                np.maximum(maximum[name], block[name], out=maximum[name])
+            count += 1
+
+        if total is None:
+            return 0, None, None, None
+
+        for name in total.dtype.names:
+            total[name] /= count
+
+        return count, total, minimum, maximum
+
+    @staticmethod
+    def take_blocks(data, tables, selected):
+        """
+        Take the blocks given by a selection from an array holding every block of a sequence of tables. Where the selection is a single run of blocks, the result is a view, so a memory-mapped array is not read.
+
+        :type data: :class:`numpy.ndarray`
+        :param data: An array with one entry along the first axis per block in tables
+        :type tables: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`numpy.ndarray`)
+        :param tables: Pairs of file names and their full block tables
+        :type selected: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`numpy.ndarray`)
+        :param selected: The result of :func:`Profiles.select_blocks` on tables
+
+        :rtype: :class:`numpy.ndarray`
+        :return: The entries of data for the selected blocks
+        """
+        starts = {}
+        count = 0
+        for file_name, table in tables:
+            starts[file_name] = (count, table)
+            count += len(table)
+
+        # Convert the selection to slices of data, merging those that are adjacent
+        pieces = []
+        for file_name, table in selected:
+            start, full = starts[file_name]
+            first = start + np.searchsorted(full["offset"], table["offset"][0])
+            if len(pieces) > 0 and pieces[-1][1] == first:
+                pieces[-1][1] = first + len(table)
+            else:
+                pieces.append([first, first + len(table)])
+
+        if len(pieces) == 1:
+            return data[pieces[0][0]:pieces[0][1]]
+
+        return np.concatenate([data[first:last] for first, last in pieces] + [data[:0]])
+
+    @staticmethod
+    def file_stats(files):
+        """
+        Return the sizes and modification times of a collection of files, as used to check whether a cache is current.
+
+        :type files: :class:`list` of :class:`str`
+        :param files: The names of the files
+
+        :rtype: :class:`numpy.ndarray`
+        :return: An array of shape (len(files), 2) of the sizes and modification times (in ns)
+        """
+        stats = [os.stat(file_name) for file_name in files]
+        return np.array([(stat.st_size, stat.st_mtime_ns) for stat in stats], dtype=np.int64).reshape((len(files), 2))
+
+    @staticmethod
+    def cache_name(files, format=default_format, sort_by=("z1",), step_regex="#Step=(.*),Time=(.*)"):
+        """
+        Return the base name of the binary cache for a collection of files read with the given options. This is a hidden name in the directory of the first file that is unique to the files and options; the data are stored in the ".npy" file of this name and the block tables in the ".npz" file.
+
+        :type files: :class:`list` of :class:`str`
+        :param files: The names of the files, in the order they are read
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The parameter--type pairs of the data to be read from the file
+        :type sort_by: :class:`tuple` of :class:`str`
+        :param sort_by: The indices to group and sort the file lines by, in order
+        :type step_regex: :class:`str`
+        :param step_regex: The regex string to use to extract the step and timestep information
+
+        :rtype: :class:`str`
+        :return: The base name of the cache files
+        """
+        key = repr(([os.path.abspath(file_name) for file_name in files], np.dtype(format).descr, list(sort_by), step_regex))
+        directory, base = os.path.split(files[0])
+        return os.path.join(directory, ".%s.%s" % (base, hashlib.sha1(key.encode()).hexdigest()[:16]))
+
+    @classmethod
+    def load_cache(cls, files, stats, format=default_format, sort_by=("z1",), step_regex="#Step=(.*),Time=(.*)"):
+        """
+        Memory-map the binary cache for a collection of files, if it exists and was written from files with the given sizes and modification times.
+
+        :type files: :class:`list` of :class:`str`
+        :param files: The names of the files, in the order they are read
+        :type stats: :class:`numpy.ndarray`
+        :param stats: The current result of :func:`Profiles.file_stats` for the files
+        :param format: As in :func:`Profiles.cache_name`
+        :param sort_by: As in :func:`Profiles.cache_name`
+        :param step_regex: As in :func:`Profiles.cache_name`
+
+        :rtype: :class:`tuple` of :class:`numpy.memmap` and :class:`list` of :class:`tuple`, or `None`
+        :return: The read-only mapped data and the block tables of each file, or `None` if there is no current cache
+        """
+        name = cls.cache_name(files, format=format, sort_by=sort_by, step_regex=step_regex)
+
+        try:
+            with np.load(name + ".npz") as meta:
+                if not np.array_equal(meta["stats"], stats):
+                    return None
+                blocks = meta["blocks"]
+                counts = meta["counts"]
+
+            data = np.load(name + ".npy", mmap_mode="r")
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+
+        if len(data) != len(blocks):
+            return None
+
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        return data, [(file_name, blocks[bounds[i]:bounds[i + 1]]) for i, file_name in enumerate(files)]
+
+    @classmethod
+    def save_cache(cls, files, stats, data, tables, format=default_format, sort_by=("z1",), step_regex="#Step=(.*),Time=(.*)"):
+        """
+        Write the binary cache for a collection of files. If the cache cannot be written (e.g., the directory is read-only), nothing is done.
+
+        :type files: :class:`list` of :class:`str`
+        :param files: The names of the files, in the order they are read
+        :type stats: :class:`numpy.ndarray`
+        :param stats: The result of :func:`Profiles.file_stats` for the files from before they were read
+        :type data: :class:`numpy.ndarray`
+        :param data: The data read from every block of the files
+        :type tables: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`numpy.ndarray`)
+        :param tables: Pairs of file names and their full block tables
+        :param format: As in :func:`Profiles.cache_name`
+        :param sort_by: As in :func:`Profiles.cache_name`
+        :param step_regex: As in :func:`Profiles.cache_name`
+        """
+        name = cls.cache_name(files, format=format, sort_by=sort_by, step_regex=step_regex)
+        temp_name = "%s.%i.tmp" % (name, os.getpid())
+
+        # The data are written first, so the block tables mark a complete cache
+        try:
+            with open(temp_name, "wb") as file:
+                np.save(file, data)
+            os.replace(temp_name, name + ".npy")
+
+            with open(temp_name, "wb") as file:
+                np.savez(file, stats=stats,
+                         blocks=np.concatenate([table for file_name, table in tables]),
+                         counts=np.array([len(table) for file_name, table in tables]))
+            os.replace(temp_name, name + ".npz")
+        except (IOError, OSError):
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+
+    @classmethod
+    def read_blocks(cls, file_name, blocks, out, chunk_size=None):
+        """
+        Parse the given blocks of a file directly into a preallocated array. Consecutive blocks are read together in chunks of roughly chunk_size bytes and parsed in bulk, so the cost is dominated by reading the file.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the file to read from
+        :type blocks: :class:`numpy.ndarray` of :attr:`Profiles.block_dtype`
+        :param blocks: A contiguous slice of the table returned by :func:`Profiles.scan_blocks`; every block must have the same number of rows
+        :type out: :class:`numpy.ndarray`
+        :param out: A structured array of shape (len(blocks), rows) into which the columns are written, in file order
+        :type chunk_size: :class:`int`
+        :param chunk_size: The number of bytes to read at a time; if `None`, instead use :attr:`Profiles.chunk_size`
+        """
+        if chunk_size is None:
+            chunk_size = cls.chunk_size
+
+        names = out.dtype.names
+        rows = out.shape[1]
+
+        with open(file_name, "rb") as file:
+            i = 0
+            while i < len(blocks):
+                # Gather as many blocks as fit in a chunk (but at least one)
+                j = max(i + 1, np.searchsorted(blocks["end"], blocks["start"][i] + chunk_size, side="right"))
+
+                file.seek(blocks["start"][i])
+                buf = file.read(blocks["end"][j - 1] - blocks["start"][i])
+
+                # Strip the headers and blank lines between blocks and parse the numbers in one pass
+                values = np.fromstring(cls._special_line.sub(b"", buf), dtype=np.float64, sep=" ")
+                if values.size != (j - i) * rows * len(names):
+                    raise ValueError("Malformed data in blocks %i to %i of %s" % (i, j - 1, file_name))
+
+                values = values.reshape((j - i, rows, len(names)))
+                for k, name in enumerate(names):
+                    out[name][i:j] = values[..., k]
+
+                i = j
+
+    @classmethod
+    def read_tables(cls, tables, format=default_format, sort_by=("z1",)):
+        """
+        Read the blocks listed in a sequence of block tables into a single array, shaped as (time, ...) where the trailing dimensions are given by the sort_by columns.
+
+        :type tables: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`numpy.ndarray`)
+        :param tables: Pairs of file names and contiguous slices of their block tables from :func:`Profiles.scan_blocks`
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The parameter--type pairs of the data to be read from the file
+        :type sort_by: :class:`tuple` of :class:`str`
+        :param sort_by: The indices to group and sort the file lines by, in order
+
+        :rtype: :class:`numpy.ndarray`
+        :return: The correctly shaped structured data array
+        """
+        ntime = sum(len(table) for file_name, table in tables)
+        rows = next(table["rows"][0] for file_name, table in tables if len(table) > 0)
+
+        for file_name, table in tables:
+            if np.any(table["rows"] != rows):
+                raise ValueError("The blocks of %s do not all have %i rows" % (file_name, rows))
+
+        # Parse every block straight into its place in the output
+        data = np.empty((ntime, rows), dtype=format)
+        t = 0
+        for file_name, table in tables:
+            cls.read_blocks(file_name, table, data[t:t + len(table)])
+            t += len(table)
+
+        return cls.shape_blocks(data, sort_by)
+
+    @staticmethod
+    def shape_blocks(data, sort_by):
+        """
+        Sort the rows of each block and reshape the blocks according to the sort_by columns. The rows are ordered by the last column of sort_by, with ties broken by the remaining columns in the order of the format.
+
+        :type data: :class:`numpy.ndarray`
+        :param data: A structured array of shape (time, rows)
+        :type sort_by: :class:`tuple` of :class:`str`
+        :param sort_by: The indices to group and sort the file lines by, in order
+
+        :rtype: :class:`numpy.ndarray`
+        :return: The array reshaped to (time, ...), with one trailing dimension per sort_by column
+        """
+        sort_by = list(sort_by)
+        if len(sort_by) == 0:
+            return data
+
+        order = sort_by[-1:] + [name for name in data.dtype.names if name in sort_by[:-1]]
+
+        # PADDI writes the same rows in the same order every time, so sort each block by the first block's ordering
+        # If the sorting columns differ between blocks, fall back to sorting each block separately
+        first = data[0]
+        if all(np.array_equal(data[key], np.broadcast_to(first[key], data[key].shape)) for key in sort_by):
+            permutation = np.argsort(first, order=order, kind="stable")
+            if np.any(permutation != np.arange(len(permutation))):
+                data = np.take(data, permutation, axis=1)
+        else:
+            data = np.sort(data, axis=1, order=order, kind="stable")
+
+        # Calculate the correct dimensions, given the sorting indices
+        total = data.shape[1]
+        dims = []
+        for key in sort_by:
+            column = data[0][key]
+            count = np.count_nonzero(column == column.min())
+            dims.append(total // count if count < total else 1)
+
+        dims.reverse()
+
+        return data.reshape((data.shape[0],) + tuple(dims))
+
     @staticmethod
     def array_from_string(string, format=default_format, sort_by=None, step_regex="#Step=(.*),Time=(.*)"):
         """
@@ -144,7 +713,7 @@ class Profiles(np.ndarray):
             dims = tuple(np.maximum(dims, 1))
 
             # Reshape the array
-            array = array.reshape([1] + dims)
+            array = array.reshape((1,) + dims)
 
             # Extract the timing information
             comment = string.split("\n")[0]
@@ -1,7 +1,6 @@
 from io import StringIO
 
 import numpy as np
-import pandas as pd
 
 from paddi_utils.data.profiles import Profiles
 
@@ -53,4 +52,24 @@ class Spectra(Profiles):
         return Profiles.__new__(cls, files, format=format, sort_by=sort_by, 
                                 step_regex="#Timstep=(.*)time=(.*)", *args, **kwargs)
 
+    @classmethod
+    def iter_blocks(cls, files, dims=1, format=default_format, **kwargs):
+        """
+        Iterate over the blocks of a sequence of spectral files one at a time, as in :func:`Profiles.iter_blocks`.
 
+        :type files: :class:`list` of :class:`str`
+        :param files: A list of the file names to load, in the desired order to load them
+        :type dims: :class:`int`
+        :param dims: The number of spectral dimensions to load (1 for Z_SPEC, 2 for XY_SPEC)
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The parameter--type pairs of the data to be read from the file; if `None`, instead use :attr:`Spectra.default_format`
+        :param kwargs: Passed to :func:`Profiles.iter_blocks`
+
+        :rtype: generator of :class:`tuple` of the form (:class:`int`, :class:`float`, :class:`numpy.ndarray`)
+        :return: The step, the time, and the correctly shaped data array of each block
+        """
+        format = [("k%i" % i, np.float) for i in range(dims)] + format
+        sort_by = ["k%i" % i for i in range(dims)]
+
+        return super(Spectra, cls).iter_blocks(files, format=format, sort_by=sort_by,
+                                               step_regex="#Timstep=(.*)time=(.*)", **kwargs)
@@ -0,0 +1,156 @@
+import fnmatch
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from paddi_utils.data.parameters import Parameters
+
+class ParameterTable(pd.DataFrame):
+    """
+    A table of the parameters of many PADDI runs, with one row per run and one typed column per parameter in the format. This class is designed to behave exactly as the :class:`pandas.core.frame.DataFrame` class, so that selections across parameter space are vectorized::
+
+        from paddi_utils.data import ParameterTable
+
+        # Read every parameter file under a directory tree...
+        table = ParameterTable.from_directory("path/to/runs")
+        # ... or every simulation in the database
+        table = ParameterTable.from_query(session.query(Simulation))
+
+        # Select runs as with any pandas dataframe
+        table[(table["compositional_stratif_param"] == -3.0) & (table["z_extent_of_the_box"] == 25.0)]
+
+    The tables are built with :func:`ParameterTable.from_directory` or :func:`ParameterTable.from_query`; the constructor is that of :class:`pandas.core.frame.DataFrame`.
+    """
+
+    @classmethod
+    def find_files(cls, paths, file_name="parameter_file"):
+        """
+        Walk directory trees for the files that hold the parameters of each run
+
+        :type paths: :class:`str` or :class:`list` of :class:`str`
+        :param paths: The directories to search
+        :type file_name: :class:`str`
+        :param file_name: The name of the files, which may be a shell-style pattern such as "OUT*"
+
+        :rtype: :class:`list` of :class:`str`
+        :return: The paths of the files found, sorted
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+
+        found = []
+        for path in paths:
+            for root, dirs, files in os.walk(path):
+                found += [os.path.join(root, name) for name in fnmatch.filter(files, file_name)]
+        return sorted(found)
+
+    @staticmethod
+    def read_file(file_name, format=None, header=False):
+        """
+        Read the parameters of one run, as a plain dictionary so that it can be passed between processes
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the file to read
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The parameter--type pairs to read; if `None`, instead use :attr:`Parameters.default_format`
+        :type header: :class:`bool`
+        :param header: If `True`, read the header of an output file with :func:`Parameters.from_header`; otherwise, read a namelist with :func:`Parameters.from_file`
+
+        :rtype: :class:`dict`
+        :return: The parameters of the run
+        """
+        if header:
+            return dict(Parameters.from_header(file_name, format=format))
+        return dict(Parameters.from_file(file_name, format=format))
+
+    @classmethod
+    def from_directory(cls, paths, file_name="parameter_file", format=None, header=False, workers=1):
+        """
+        Build the table from the parameter files found under directory trees. Files are read in this process or, given more than one worker, in a pool of processes, and the results are kept in :attr:`Parameters.cache`, so that building the table again only reads the files that have changed.
+
+        :type paths: :class:`str` or :class:`list` of :class:`str`
+        :param paths: The directories to search
+        :type file_name: :class:`str`
+        :param file_name: The name of the files, which may be a shell-style pattern; there should be one per run
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The parameter--type pairs to use as columns; if `None`, instead use :attr:`Parameters.default_format`
+        :type header: :class:`bool`
+        :param header: If `True`, the files are output files with a parameter header (e.g., "OUT01") rather than namelists
+        :type workers: :class:`int` or `None`
+        :param workers: The maximum number of processes used to read files that are not cached; by default, 1, read them in this process, and if `None`, use one per processor. A pool of processes must be started from code under an ``if __name__ == "__main__":`` guard on platforms that spawn rather than fork new processes
+
+        :rtype: :class:`ParameterTable`
+        :return: The table, indexed by the directory of each run
+        """
+        if format is None:
+            format = Parameters.default_format
+
+        files = cls.find_files(paths, file_name)
+
+        # The rows are the expanded parameters, not the raw values cached by the constructors of Parameters, so keep them under their own keys
+        keys = [Parameters.cache.key(name, "table", "header" if header else "namelist", tuple(format)) for name in files]
+        rows = [Parameters.cache.get(key) for key in keys]
+        missing = [i for i, row in enumerate(rows) if row is None]
+
+        read = partial(ParameterTable.read_file, format=format, header=header)
+        if len(missing) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(read, [files[i] for i in missing]))
+        else:
+            results = [read(files[i]) for i in missing]
+
+        for i, result in zip(missing, results):
+            rows[i] = result
+            Parameters.cache.put(keys[i], result)
+
+        return cls.from_rows(rows, format, index=pd.Index([os.path.dirname(os.path.abspath(name)) for name in files], name="path"))
+
+    @classmethod
+    def from_query(cls, query, format=None):
+        """
+        Build the table from a query of :class:`paddi_utils.db.Simulation` rows, with a single SQL select rather than one object per simulation
+
+        :type query: :class:`sqlalchemy.orm.query.Query`
+        :param query: The query, e.g. ``session.query(Simulation).filter(...)``
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The parameter--type pairs to use as columns; if `None`, instead use :attr:`Parameters.default_format`
+
+        :rtype: :class:`ParameterTable`
+        :return: The table, indexed by the path of each simulation, with its database id as the "id" column
+        """
+        if format is None:
+            format = Parameters.default_format
+
+        frame = pd.read_sql(query.statement, query.session.bind)
+        table = cls.from_rows(frame.to_dict("records"), format, index=pd.Index(frame["path"], name="path"))
+        table.insert(0, "id", frame["id"].values)
+        return table
+
+    @classmethod
+    def from_rows(cls, rows, format, index=None):
+        """
+        Build the table from the parameters of each run, converting each column to its type in format. A column with missing values is stored as floats, with NaN for the missing values.
+
+        :type rows: :class:`list` of :class:`dict`
+        :param rows: The parameters of each run
+        :type format: :class:`list` of :class:`tuple` of the form (:class:`str`, :class:`type`)
+        :param format: The parameter--type pairs to use as columns
+        :type index: :class:`pandas.Index`
+        :param index: The index of the rows
+
+        :rtype: :class:`ParameterTable`
+        :return: The table
+        """
+        columns = {}
+        for name, dtype in format:
+            values = [row.get(name) for row in rows]
+            # Missing values are None, or NaN when read from the database
+            missing = [value is None or value != value for value in values]
+            if any(missing):
+                columns[name] = np.array([np.nan if gap else value for value, gap in zip(values, missing)], dtype=np.float64)
+            else:
+                columns[name] = np.array(values, dtype=dtype)
+        return cls(columns, index=index)
@@ -1,2 +1,12 @@
-from paddi_utils.db.session import Session
-from paddi_utils.db.simulation import Simulation, Tag, OutputFile
+"""
+The public classes of this module are imported lazily, when they are first accessed (see :mod:`paddi_utils.lazy`), so that SQLAlchemy is only imported when the database is used.
+"""
+from paddi_utils.lazy import lazy_import
+
+__all__, __getattr__, __dir__ = lazy_import(__name__, {"Session": "paddi_utils.db.session",
+                                                       "Simulation": "paddi_utils.db.simulation",
+                                                       "Tag": "paddi_utils.db.simulation",
+                                                       "OutputFile": "paddi_utils.db.simulation",
+                                                       "Result": "paddi_utils.db.simulation",
+                                                       "AnalysisCache": "paddi_utils.db.cache",
+                                                       "Ingest": "paddi_utils.db.ingest"})
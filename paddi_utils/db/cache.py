@@ -0,0 +1,203 @@
+"""
+This module stores the results of expensive analyses of each simulation in the database, so that re-running an analysis over a campaign only recomputes the runs whose input files have changed::
+
+    from paddi_utils.db import Session, Simulation, AnalysisCache
+
+    session = Session()
+    cache = AnalysisCache(session, "linear_growth", version=1, types=["diagnostic"])
+
+    sims = [sim for sim, tags in Simulation.Table(session)]
+    cache.put_many([(sim, analyze(sim.files("diagnostic"))) for sim in cache.stale(sims)])
+    session.commit()
+    results = cache.get_many(sims)
+
+Results are invalidated automatically: an entry is only returned while the version of the analysis and the fingerprint of its input files match those it was stored with. The writes are made in the current transaction of the session, and committing it is left to the caller, so that results can be stored together with other changes (e.g., tags) in one transaction.
+"""
+import hashlib
+import numbers
+import os
+
+import sqlalchemy
+
+from paddi_utils.db.simulation import OutputFile, Result
+
+class AnalysisCache(object):
+    """
+    A cache of the results of one analysis, keyed by simulation. Each result is stored with the version of the analysis and a fingerprint of the :class:`paddi_utils.db.OutputFile` rows it was computed from (see :func:`AnalysisCache.fingerprints`), and a result whose version or fingerprint no longer matches is treated as missing. The values of a result are a dictionary of scalars and arrays.
+
+    :type session: :class:`sqlalchemy.orm.session.Session`
+    :param session: The session connected to the database
+    :type analysis: :class:`str`
+    :param analysis: The name of the analysis
+    :type version: :class:`int`
+    :param version: The version of the analysis, to be incremented whenever a change to it should invalidate the stored results
+    :type types: :class:`list` of :class:`str` or `None`
+    :param types: The types of output file (see :attr:`paddi_utils.db.OutputFile.filenames`) that the analysis reads; if `None`, all of them
+    """
+
+    batch_size = 500
+    """The number of simulations selected or written per statement"""
+
+    def __init__(self, session, analysis, version=1, types=None):
+        self.session = session
+        self.analysis = analysis
+        self.version = version
+        self.types = None if types is None else list(types)
+
+    @staticmethod
+    def key(sim):
+        """
+        Return the id of a simulation, without loading it from the database if it has been expired (e.g. by a commit)
+
+        :type sim: :class:`paddi_utils.db.Simulation` or :class:`int`
+        :param sim: The simulation, or its id (which may be any integer type, e.g. a numpy integer from an array of ids)
+
+        :rtype: :class:`int`
+        :return: The id of the simulation
+        """
+        if isinstance(sim, numbers.Integral):
+            return int(sim)
+        return sqlalchemy.inspect(sim).identity[0]
+
+    def fingerprints(self, sims):
+        """
+        Return the fingerprints of the input files of a list of simulations: a hash of the name, type, size and modification time of each file. These are read from the :class:`paddi_utils.db.OutputFile` rows in batches, and so are kept current by :func:`paddi_utils.db.Ingest.sync`; files that have not been synced since they were added to the catalog are looked up on disk instead.
+
+        :type sims: :class:`list` of :class:`paddi_utils.db.Simulation` or :class:`int`
+        :param sims: The simulations, or their ids
+
+        :rtype: :class:`dict` of :class:`str` with :class:`int` keys
+        :return: The fingerprint of each simulation, keyed by id
+        """
+        ids = [self.key(sim) for sim in sims]
+        files = {sim_id: [] for sim_id in ids}
+        for start in range(0, len(ids), self.batch_size):
+            query = self.session.query(OutputFile.sim_id, OutputFile.file, OutputFile.type, OutputFile.size, OutputFile.mtime)
+            query = query.filter(OutputFile.sim_id.in_(ids[start:start + self.batch_size]))
+            if self.types is not None:
+                query = query.filter(OutputFile.type.in_(self.types))
+            for sim_id, file, type, size, mtime in query:
+                files[sim_id].append((file, type, size, mtime))
+
+        fingerprints = {}
+        for sim_id, rows in files.items():
+            digest = hashlib.sha1()
+            for file, type, size, mtime in sorted(rows):
+                if size is None or mtime is None:
+                    try:
+                        stat = os.stat(file)
+                        size, mtime = stat.st_size, stat.st_mtime_ns
+                    except OSError:
+                        pass
+                digest.update(("%s\0%s\0%s\0%s\n" % (file, type, size, mtime)).encode())
+            fingerprints[sim_id] = digest.hexdigest()
+        return fingerprints
+
+    def select(self, ids, *columns):
+        """
+        Select the stored results of this analysis for a list of simulations, in batches
+
+        :type ids: :class:`list` of :class:`int`
+        :param ids: The ids of the simulations
+        :param columns: The columns of :class:`paddi_utils.db.Result` to select, after the id of the simulation
+
+        :rtype: generator of :class:`tuple`
+        :return: The rows of the results
+        """
+        for start in range(0, len(ids), self.batch_size):
+            query = self.session.query(Result.sim_id, *columns).filter(Result.analysis == self.analysis, Result.sim_id.in_(ids[start:start + self.batch_size]))
+            for row in query:
+                yield row
+
+    def get_many(self, sims):
+        """
+        Return the valid stored results for a list of simulations
+
+        :type sims: :class:`list` of :class:`paddi_utils.db.Simulation` or :class:`int`
+        :param sims: The simulations, or their ids
+
+        :rtype: :class:`dict` of :class:`dict` with :class:`int` keys
+        :return: The values of each valid result, keyed by simulation id; simulations without a valid result are left out
+        """
+        fingerprints = self.fingerprints(sims)
+        results = {}
+        for sim_id, version, fingerprint, data in self.select(list(fingerprints), Result.version, Result.fingerprint, Result.data):
+            if version == self.version and fingerprint == fingerprints[sim_id]:
+                results[sim_id] = Result.decode(data)
+        return results
+
+    def get(self, sim):
+        """
+        Return the valid stored result for a simulation
+
+        :type sim: :class:`paddi_utils.db.Simulation` or :class:`int`
+        :param sim: The simulation, or its id
+
+        :rtype: :class:`dict` or `None`
+        :return: The values of the result, or `None` if there is no valid result
+        """
+        return self.get_many([sim]).get(self.key(sim))
+
+    def stale(self, sims):
+        """
+        Return the simulations without a valid stored result, i.e. those that need to be analyzed. This does not read the stored values.
+
+        :type sims: :class:`list` of :class:`paddi_utils.db.Simulation` or :class:`int`
+        :param sims: The simulations, or their ids
+
+        :rtype: :class:`list` of :class:`paddi_utils.db.Simulation` or :class:`int`
+        :return: The simulations that need to be analyzed, in order
+        """
+        valid = set()
+        fingerprints = self.fingerprints(sims)
+        for sim_id, version, fingerprint in self.select(list(fingerprints), Result.version, Result.fingerprint):
+            if version == self.version and fingerprint == fingerprints[sim_id]:
+                valid.add(sim_id)
+        return [sim for sim in sims if self.key(sim) not in valid]
+
+    def put_many(self, results):
+        """
+        Store the results for a list of simulations with bulk statements in the current transaction, replacing any previous results of this analysis for them. The session is not committed.
+
+        :type results: :class:`list` of (:class:`paddi_utils.db.Simulation` or :class:`int`, :class:`dict`)
+        :param results: Each simulation (or its id) and the values of its result, as scalars or arrays
+        """
+        results = list(results)
+        connection = self.session.connection()
+        table = Result.__table__
+
+        fingerprints = self.fingerprints([sim for sim, values in results])
+        ids = list(fingerprints)
+        for start in range(0, len(ids), self.batch_size):
+            connection.execute(table.delete().where(sqlalchemy.and_(table.c.analysis == self.analysis, table.c.sim_id.in_(ids[start:start + self.batch_size]))))
+
+        rows = [{"sim_id": self.key(sim), "analysis": self.analysis, "version": self.version, "fingerprint": fingerprints[self.key(sim)], "data": Result.encode(values)} for sim, values in results]
+        if rows:
+            connection.execute(table.insert(), rows)
+
+    def put(self, sim, values):
+        """
+        Store the result for a simulation in the current transaction, replacing any previous result of this analysis for it. The session is not committed.
+
+        :type sim: :class:`paddi_utils.db.Simulation` or :class:`int`
+        :param sim: The simulation, or its id
+        :type values: :class:`dict` with :class:`str` keys
+        :param values: The values of the result, as scalars or arrays
+        """
+        self.put_many([(sim, values)])
+
+    def invalidate(self, sims=None):
+        """
+        Delete the stored results of this analysis in the current transaction. The session is not committed.
+
+        :type sims: :class:`list` of :class:`paddi_utils.db.Simulation` or :class:`int`, or `None`
+        :param sims: The simulations (or their ids) whose results to delete; if `None`, delete the results for every simulation
+        """
+        table = Result.__table__
+        connection = self.session.connection()
+        if sims is None:
+            connection.execute(table.delete().where(table.c.analysis == self.analysis))
+        else:
+            ids = [self.key(sim) for sim in sims]
+            for start in range(0, len(ids), self.batch_size):
+                connection.execute(table.delete().where(sqlalchemy.and_(table.c.analysis == self.analysis, table.c.sim_id.in_(ids[start:start + self.batch_size]))))
@@ -0,0 +1,296 @@
+"""
+This module catalogs whole campaigns of PADDI runs in the database at once. For example, the following will add every run under a directory tree, skipping those already cataloged and unchanged::
+
+    from paddi_utils.db import Session
+    from paddi_utils.db.ingest import Ingest
+
+    session = Session()
+    Ingest(session).run("path/to/runs")
+
+Runs that are already cataloged can instead have only their output files brought up to date, e.g. for a nightly refresh that picks up the files written after restarts::
+
+    Ingest(session).sync("path/to/runs")
+
+The same is available from the command line as ``ingest.py path/to/runs``, or ``ingest.py --sync path/to/runs``.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import sqlalchemy
+
+from paddi_utils.data.parameters import Parameters
+from paddi_utils.data.table import ParameterTable
+from paddi_utils.db.simulation import Simulation, Tag, OutputFile
+
+class Ingest(object):
+    """
+    Add the runs found under directory trees to the database. The parameter file, output files and shear tags of each run are read in this process or, given more than one worker, in a pool of processes, and the rows are written with bulk inserts in batches, rather than one ORM object at a time. A run is identified by its directory; one that is already cataloged is skipped if its parameter file has the same modification time and size, and is otherwise updated in place.
+
+    :type session: :class:`sqlalchemy.orm.session.Session`
+    :param session: The session connected to the database
+    :type file_name: :class:`str`
+    :param file_name: The name of the parameter file of each run, which may be a shell-style pattern
+    :type batch_size: :class:`int`
+    :param batch_size: The number of runs written per batch
+    :type workers: :class:`int` or `None`
+    :param workers: The maximum number of processes; by default, 1, read in this process, and if `None`, use one per processor. A pool of processes must be started from code under an ``if __name__ == "__main__":`` guard on platforms that spawn rather than fork new processes
+    """
+
+    batch_size = 500
+    """The default number of runs written per batch"""
+
+    shear_tag_names = ("period", "Ri", "Pe")
+    """The tags computed by :func:`Ingest.shear_tags`; these are the only tags replaced when a run is updated, so that tags written by analyses are kept"""
+
+    def __init__(self, session, file_name="parameter_file", batch_size=None, workers=1):
+        self.session = session
+        self.file_name = file_name
+        self.batch_size = self.batch_size if batch_size is None else batch_size
+        self.workers = workers
+
+    @staticmethod
+    def find_output_files(path):
+        """
+        Find the output files of a run, by the prefixes in :attr:`OutputFile.filenames`. The directory is listed once, and the size and modification time of each file are recorded so that :func:`Ingest.sync` can tell which files have changed.
+
+        :type path: :class:`str`
+        :param path: The directory of the run
+
+        :rtype: :class:`list` of :class:`dict` or `None`
+        :return: The file, type, iteration, size and modification time of each output file, as columns of :class:`OutputFile`; `None` if the directory cannot be listed
+        """
+        try:
+            entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+        except OSError:
+            return None
+
+        files = []
+        for type, prefix in OutputFile.filenames.items():
+            for entry in entries:
+                if entry.name.startswith(prefix) and entry.is_file():
+                    stat = entry.stat()
+                    digits = "".join(filter(str.isdigit, entry.name))
+                    files.append({"file": os.path.abspath(entry.path), "type": type, "iter": int(digits) if digits else None,
+                                  "size": stat.st_size, "mtime": stat.st_mtime_ns})
+        return files
+
+    @staticmethod
+    def shear_tags(path, params):
+        """
+        Compute the period, Richardson number and Peclet number of a sheared run from its "shear_file.dat"
+
+        :type path: :class:`str`
+        :param path: The directory of the run
+        :type params: :class:`paddi_utils.data.Parameters`
+        :param params: The parameters of the run
+
+        :rtype: :class:`list` of :class:`dict`
+        :return: The name and value of each tag, or an empty list if the run has no shear file
+        """
+        try:
+            data = np.genfromtxt(os.path.join(path, "shear_file.dat"), delimiter=", ", dtype=[("t", np.float), ("u", np.float), ("v", np.float), ("phi", np.float)])
+        except OSError:
+            return []
+
+        umax = np.max(data["u"])
+        return [{"name": "period", "value": float(np.max(data["t"]) + data["t"][-1] - data["t"][-2])},
+                {"name": "Ri", "value": float((params["B_therm"] * params["S_therm"] - params["B_comp"] * params["S_comp"]) / umax ** 2)},
+                {"name": "Pe", "value": float(umax * params["Gammaz"] ** 2 / 2 / np.pi)}]
+
+    @classmethod
+    def read_run(cls, file_name):
+        """
+        Read everything cataloged about one run. This returns plain containers, so that it can be run in another process.
+
+        :type file_name: :class:`str`
+        :param file_name: The name of the parameter file of the run
+
+        :rtype: :class:`dict`
+        :return: The "simulation" row, with the parameters and the stamp of the parameter file, and the "tags" and "output_files" rows
+        """
+        path = os.path.dirname(os.path.abspath(file_name))
+        stat = os.stat(file_name)
+        params = Parameters.from_file(file_name)
+
+        simulation = {name: params.get(name) for name, type in Parameters.default_format}
+        simulation.update(path=path, parameter_mtime=stat.st_mtime_ns, parameter_size=stat.st_size)
+        return {"simulation": simulation,
+                "tags": cls.shear_tags(path, params),
+                "output_files": cls.find_output_files(path) or []}
+
+    def cataloged(self):
+        """
+        Return the runs already in the database, from a single select
+
+        :rtype: :class:`dict` of (:class:`int`, :class:`int`, :class:`int`) with :class:`str` keys
+        :return: The id and the modification time and size of the parameter file of each run, keyed by path
+        """
+        query = self.session.query(Simulation.path, Simulation.id, Simulation.parameter_mtime, Simulation.parameter_size)
+        return {path: (id, mtime, size) for path, id, mtime, size in query}
+
+    def write(self, runs, cataloged, counts):
+        """
+        Write a batch of runs to the database in one transaction, with one bulk statement per table. Runs that are already cataloged are updated: their shear tags (see :attr:`Ingest.shear_tag_names`) are replaced, and their output files synced (see :func:`Ingest.sync_files`).
+
+        :type runs: :class:`list` of :class:`dict`
+        :param runs: The runs, as from :func:`Ingest.read_run`
+        :type cataloged: :class:`dict`
+        :param cataloged: The runs already in the database, as from :func:`Ingest.cataloged`
+        :type counts: :class:`dict` of :class:`int`
+        :param counts: The numbers of runs "added" and "updated", which are incremented
+        """
+        connection = self.session.connection()
+        new = [run["simulation"] for run in runs if run["simulation"]["path"] not in cataloged]
+        old = [run["simulation"] for run in runs if run["simulation"]["path"] in cataloged]
+
+        ids = {}
+        if new:
+            connection.execute(Simulation.__table__.insert(), new)
+            paths = [simulation["path"] for simulation in new]
+            ids.update(connection.execute(sqlalchemy.select([Simulation.path, Simulation.id]).where(Simulation.path.in_(paths))).fetchall())
+        if old:
+            ids.update((simulation["path"], cataloged[simulation["path"]][0]) for simulation in old)
+            connection.execute(Simulation.__table__.update().where(Simulation.id == sqlalchemy.bindparam("sim_id")),
+                               [dict(simulation, sim_id=ids[simulation["path"]]) for simulation in old])
+            stale = [ids[simulation["path"]] for simulation in old]
+            connection.execute(Tag.__table__.delete().where(sqlalchemy.and_(Tag.sim_id.in_(stale), Tag.name.in_(self.shear_tag_names))))
+            self.sync_files(connection, {ids[run["simulation"]["path"]]: run["output_files"] for run in runs if run["simulation"]["path"] in cataloged})
+
+        tags = [dict(tag, sim_id=ids[run["simulation"]["path"]]) for run in runs for tag in run["tags"]]
+        if tags:
+            connection.execute(Tag.__table__.insert(), tags)
+        files = [dict(file, sim_id=ids[run["simulation"]["path"]]) for run in runs for file in run["output_files"] if run["simulation"]["path"] not in cataloged]
+        if files:
+            connection.execute(OutputFile.__table__.insert(), files)
+
+        self.session.commit()
+        counts["added"] += len(new)
+        counts["updated"] += len(old)
+
+    def sync_files(self, connection, found):
+        """
+        Bring the output files of cataloged runs up to date with those on disk, writing only the differences: rows are inserted for new files, updated for files whose size or modification time has changed, and deleted for files that are gone.
+
+        :type connection: :class:`sqlalchemy.engine.Connection`
+        :param connection: The connection, within the transaction to write in
+        :type found: :class:`dict` of :class:`list` of :class:`dict` with :class:`int` keys
+        :param found: The output files on disk of each run, as from :func:`Ingest.find_output_files`, keyed by simulation id
+
+        :rtype: :class:`dict` of :class:`int`
+        :return: The number of files "inserted", "updated" and "deleted"
+        """
+        table = OutputFile.__table__
+        query = sqlalchemy.select([table.c.id, table.c.sim_id, table.c.file, table.c.size, table.c.mtime])
+        if len(found) <= self.batch_size:
+            query = query.where(table.c.sim_id.in_(list(found)))
+
+        stored = {}
+        for id, sim_id, file, size, mtime in connection.execute(query):
+            if sim_id in found:
+                stored[(sim_id, file)] = (id, size, mtime)
+
+        inserted, updated = [], []
+        for sim_id, files in found.items():
+            for file in files:
+                row = stored.pop((sim_id, file["file"]), None)
+                if row is None:
+                    inserted.append(dict(file, sim_id=sim_id))
+                elif row[1:] != (file["size"], file["mtime"]):
+                    updated.append(dict(file, file_id=row[0]))
+        deleted = [row[0] for row in stored.values()]
+
+        if inserted:
+            connection.execute(table.insert(), inserted)
+        if updated:
+            connection.execute(table.update().where(table.c.id == sqlalchemy.bindparam("file_id")), updated)
+        for start in range(0, len(deleted), self.batch_size):
+            connection.execute(table.delete().where(table.c.id.in_(deleted[start:start + self.batch_size])))
+
+        return {"inserted": len(inserted), "updated": len(updated), "deleted": len(deleted)}
+
+    def sync(self, paths=None):
+        """
+        Sync the output files of runs already in the catalog with those on disk, without reading their parameters again. The directories are listed in a pool of threads, and only the differences are written, in one transaction (see :func:`Ingest.sync_files`). Runs whose directory cannot be listed are left untouched.
+
+        :type paths: :class:`str` or :class:`list` of :class:`str` or `None`
+        :param paths: Only sync the runs within these directories; if `None`, sync every cataloged run
+
+        :rtype: :class:`dict` of :class:`int`
+        :return: The number of output files "inserted", "updated" and "deleted"
+        """
+        cataloged = self.cataloged()
+        if paths is not None:
+            if isinstance(paths, str):
+                paths = [paths]
+            roots = [os.path.join(os.path.abspath(path), "") for path in paths]
+            cataloged = {path: known for path, known in cataloged.items() if any(os.path.join(path, "").startswith(root) for root in roots)}
+
+        runs = list(cataloged.items())
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            listings = pool.map(Ingest.find_output_files, [path for path, known in runs])
+            found = {known[0]: files for (path, known), files in zip(runs, listings) if files is not None}
+
+        counts = self.sync_files(self.session.connection(), found)
+        self.session.commit()
+        return counts
+
+    def run(self, paths):
+        """
+        Catalog the runs under directory trees (see :func:`Ingest.add`)
+
+        :type paths: :class:`str` or :class:`list` of :class:`str`
+        :param paths: The directories to search
+
+        :rtype: :class:`dict` of :class:`int`
+        :return: The number of runs "added", "updated" and "skipped"
+        """
+        return self.add(ParameterTable.find_files(paths, self.file_name))
+
+    def add(self, found):
+        """
+        Catalog the runs of a list of parameter files. Runs are read (in a pool of processes if there is more than one worker) and written as they arrive, in batches of :attr:`Ingest.batch_size`.
+
+        :type found: :class:`list` of :class:`str`
+        :param found: The parameter files, one per run
+
+        :rtype: :class:`dict` of :class:`int`
+        :return: The number of runs "added", "updated" and "skipped"
+        """
+        cataloged = self.cataloged()
+
+        files = []
+        for file in found:
+            stat = os.stat(file)
+            known = cataloged.get(os.path.dirname(os.path.abspath(file)))
+            if known is None or known[1:] != (stat.st_mtime_ns, stat.st_size):
+                files.append(file)
+        counts = {"added": 0, "updated": 0, "skipped": len(found) - len(files)}
+
+        if len(files) > 1 and self.workers != 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                self.write_batches(pool.map(Ingest.read_run, files, chunksize=16), cataloged, counts)
+        else:
+            self.write_batches(map(Ingest.read_run, files), cataloged, counts)
+
+        return counts
+
+    def write_batches(self, runs, cataloged, counts):
+        """
+        Write runs to the database as they arrive, in batches of :attr:`Ingest.batch_size`
+
+        :type runs: iterable of :class:`dict`
+        :param runs: The runs, as from :func:`Ingest.read_run`
+        :type cataloged: :class:`dict`
+        :param cataloged: The runs already in the database, as from :func:`Ingest.cataloged`
+        :type counts: :class:`dict` of :class:`int`
+        :param counts: The numbers of runs "added" and "updated", which are incremented
+        """
+        batch = []
+        for run in runs:
+            batch.append(run)
+            if len(batch) >= self.batch_size:
+                self.write(batch, cataloged, counts)
+                batch = []
+        if batch:
+            self.write(batch, cataloged, counts)
@@ -1,7 +1,10 @@
+import importlib
+import os
 from os.path import expanduser
 
 import numpy as np
 import sqlalchemy
+import sqlalchemy.orm
 from sqlalchemy.ext.declarative import declarative_base, declared_attr
 
 Base = declarative_base()
@@ -11,17 +14,94 @@ sqlalchemy_types = {np.float: sqlalchemy.Float,
                     np.int: sqlalchemy.Integer}
 
 
-def Session(password = None, *args, **kwargs):
+default_url = "sqlite:///" + expanduser("~/paddi.db")
+"""The database used if no URL is given and the PADDI_DB_URL environment variable is not set"""
+
+sqlite_pragmas = {"journal_mode": "WAL",
+                  "synchronous": "NORMAL",
+                  "mmap_size": 2 ** 28,
+                  "busy_timeout": 30000}
+"""The pragmas set on every new SQLite connection; write-ahead logging lets readers work alongside a writer, and the busy timeout makes concurrent writers wait for each other instead of failing because the database is locked"""
+
+engines = {}
+"""The engines created so far, keyed by URL"""
+
+
+def set_sqlite_pragmas(connection, record):
+    """
+    Set :data:`sqlite_pragmas` on a new SQLite connection. This is registered as a "connect" event listener by :func:`get_engine`.
+    """
+    cursor = connection.cursor()
+    for name, value in sqlite_pragmas.items():
+        cursor.execute("PRAGMA %s = %s" % (name, value))
+    cursor.close()
+
+
+def migrate(engine):
+    """
+    Bring the schema of an existing database up to date. :func:`sqlalchemy.schema.MetaData.create_all` creates missing tables along with their indexes, but leaves tables that already exist untouched, so the columns and indexes added to them since are created here. New columns are added empty, as `NULL`.
+
+    :type engine: :class:`sqlalchemy.engine.Engine`
+    :param engine: The engine connected to the database
     """
-    This function returns a :class:`sqlalchemy:Session` instance that is connected to the database on the system of choice. For the moment, this system is fixed to be on Loki and is password protected.
+    # The tables are only registered once the models are defined, which import this module
+    importlib.import_module("paddi_utils.db.simulation")
 
+    Base.metadata.create_all(engine)
+    inspector = sqlalchemy.inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        with engine.begin() as connection:
+            for column in table.columns:
+                if column.name not in existing:
+                    connection.execute(sqlalchemy.text("ALTER TABLE %s ADD COLUMN %s %s" % (table.name, column.name, column.type.compile(engine.dialect))))
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def get_engine(url=None, **kwargs):
+    """
+    Return the engine for a database, creating it and migrating its schema (see :func:`migrate`) on first use. Engines are cached, so that each process keeps one connection pool per database. SQLite databases are set up for concurrent use with :data:`sqlite_pragmas`.
+
+    :type url: :class:`str`
+    :param url: The URL of the database; if `None`, use the PADDI_DB_URL environment variable, or :data:`default_url` if that is not set
+    :param kwargs: Passed to :func:`sqlalchemy.create_engine` when the engine is created
+
+    :rtype: :class:`sqlalchemy.engine.Engine`
+    :returns: The engine connected to the database
+    """
+    if url is None:
+        url = os.environ.get("PADDI_DB_URL", default_url)
+
+    if url not in engines:
+        if url.startswith("sqlite"):
+            kwargs.setdefault("connect_args", {"check_same_thread": False})
+            if url in ("sqlite://", "sqlite:///:memory:"):
+                # An in-memory database only exists within its one connection
+                kwargs.setdefault("poolclass", sqlalchemy.pool.StaticPool)
+            else:
+                kwargs.setdefault("poolclass", sqlalchemy.pool.QueuePool)
+
+        engine = sqlalchemy.create_engine(url, echo=False, **kwargs)
+        if engine.dialect.name == "sqlite":
+            sqlalchemy.event.listen(engine, "connect", set_sqlite_pragmas)
+
+        migrate(engine)
+        engines[url] = engine
+
+    return engines[url]
+
+
+def Session(password=None, *args, url=None, **kwargs):
+    """
+    This function returns a :class:`sqlalchemy:Session` instance that is connected to the database of choice. The database is given by url, or by the PADDI_DB_URL environment variable, and is otherwise the SQLite database "~/paddi.db". The engine and the tables are only set up on the first call for each database (see :func:`get_engine`).
+
+    :type url: :class:`str`
+    :param url: The URL of the database; if `None`, use the PADDI_DB_URL environment variable, or :data:`default_url` if that is not set
     :param args: Passed to :func:`sqlalchemy.orm.sessionmaker`
     :param kwargs: Passed to :func:`sqlalchemy.orm.sessionmaker`
 
     :rtype: :class:`sqlalchemy.orm.session.Session`
-    :returns: The session instance that is connected either remotely or locally to the database
+    :returns: The session instance that is connected to the database
     """
-    engine = sqlalchemy.create_engine('sqlite:///' + expanduser('~/paddi.db'), echo = False)
-    Base.metadata.create_all(engine)
-
-    return sqlalchemy.orm.sessionmaker(bind = engine)(*args, **kwargs)
+    return sqlalchemy.orm.sessionmaker(bind=get_engine(url))(*args, **kwargs)
@@ -1,8 +1,13 @@
 import enum
+import json
+import math
+import struct
 from os.path import abspath
 
+import numpy as np
+import pandas as pd
 import sqlalchemy
-from sqlalchemy.orm import relationship, aliased
+from sqlalchemy.orm import relationship, aliased, selectinload
 
 from paddi_utils.data import Parameters
 from paddi_utils.db.session import Base, sqlalchemy_types
@@ -11,7 +16,9 @@ from paddi_utils.db.session import Base, sqlalchemy_types
 class Simulation(Base):
     __tablename__ = "simulations"
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
-    path = sqlalchemy.Column(sqlalchemy.String)
+    path = sqlalchemy.Column(sqlalchemy.String, index=True)
+    parameter_mtime = sqlalchemy.Column(sqlalchemy.BigInteger)
+    parameter_size = sqlalchemy.Column(sqlalchemy.Integer)
     tags = relationship("Tag", backref="simulation")
     output_files = relationship("OutputFile", backref="simulation")
 
@@ -45,6 +52,112 @@ class Simulation(Base):
             alias = aliased(Tag)
             return self.query.filter(alias.name == self.name, alias.value != other).join(alias)
 
+    class Table(object):
+        """
+        A query of simulations along with the values of their tags, fetched in one round trip rather than by loading the tags of each simulation lazily. The tags are pivoted into one column each by conditional aggregation, and the output files of the simulations are loaded together with a second select::
+
+            table = Simulation.Table(session, ["Ri", "period", "linear_growth"])
+            table.filter(Simulation.z_extent_of_the_box == 25.0).having(table["Ri"] < 1.0)
+
+            for sim, tags in table:
+                print(sim.path, tags["Ri"], sim.files("diagnostic"))
+
+        A tag that a simulation does not have is `None`.
+
+        :type session: :class:`sqlalchemy.orm.session.Session`
+        :param session: The session connected to the database
+        :type tags: :class:`list` of :class:`str`
+        :param tags: The names of the tags to include as columns
+        :type files: :class:`bool`
+        :param files: If `True`, load the output files of each simulation along with it
+        """
+
+        def __init__(self, session, tags=(), files=True):
+            self.tags = list(tags)
+            self.columns = {name: sqlalchemy.func.max(sqlalchemy.case((Tag.name == name, Tag.value))) for name in self.tags}
+
+            # Only join the requested tags, through the (sim_id, name) index
+            self.query = session.query(Simulation, *[self.columns[name].label(name) for name in self.tags])
+            self.query = self.query.outerjoin(Tag, sqlalchemy.and_(Tag.sim_id == Simulation.id, Tag.name.in_(self.tags))).group_by(Simulation.id)
+            if files:
+                self.query = self.query.options(selectinload(Simulation.output_files))
+
+        def __getitem__(self, name):
+            """
+            Return the column of a tag, to be used in :func:`Simulation.Table.having` or :func:`Simulation.Table.order_by`
+            """
+            return self.columns[name]
+
+        def __iter__(self):
+            for row in self.query:
+                # Without tags, the query returns simulations rather than rows
+                if not self.tags:
+                    yield row, {}
+                else:
+                    yield row[0], dict(zip(self.tags, row[1:]))
+
+        def filter(self, *criteria):
+            """
+            Filter the simulations in SQL by their columns, e.g. ``Simulation.z_extent_of_the_box == 25.0``
+
+            :rtype: :class:`Simulation.Table`
+            :return: This table, for chaining
+            """
+            self.query = self.query.filter(*criteria)
+            return self
+
+        def having(self, *criteria):
+            """
+            Filter the simulations in SQL by their tags, e.g. ``table["Ri"] < 1.0``
+
+            :rtype: :class:`Simulation.Table`
+            :return: This table, for chaining
+            """
+            self.query = self.query.having(*criteria)
+            return self
+
+        def order_by(self, *criteria):
+            """
+            Order the simulations in SQL, by their columns or tags
+
+            :rtype: :class:`Simulation.Table`
+            :return: This table, for chaining
+            """
+            self.query = self.query.order_by(*criteria)
+            return self
+
+        def to_frame(self, types=()):
+            """
+            Return the table as a dataframe, with one row per simulation and one column per parameter and tag; missing tags are NaN
+
+            :type types: :class:`list` of :class:`str`
+            :param types: The types of output file (see :attr:`OutputFile.filenames`) to include as columns of file lists
+
+            :rtype: :class:`pandas.DataFrame`
+            :return: The dataframe, indexed by simulation id
+            """
+            rows = []
+            for sim, tags in self:
+                row = {"id": sim.id, "path": sim.path}
+                row.update((name, getattr(sim, name)) for name, type in Parameters.default_format)
+                row.update((name, float("nan") if value is None else value) for name, value in tags.items())
+                row.update((type, sim.files(type)) for type in types)
+                rows.append(row)
+            columns = ["id", "path"] + [name for name, type in Parameters.default_format] + self.tags + list(types)
+            return pd.DataFrame(rows, columns=columns).set_index("id")
+
+    def files(self, type):
+        """
+        Return the output files of one type, in order
+
+        :type type: :class:`str`
+        :param type: The type of output file, as in :attr:`OutputFile.filenames`
+
+        :rtype: :class:`list` of :class:`str`
+        :return: The sorted file names
+        """
+        return sorted(file.file for file in self.output_files if file.type == type)
+
     @classmethod
     def from_params(cls, params, path="."):
         self = cls(path=abspath(path))
@@ -55,6 +168,8 @@ class Simulation(Base):
 
 class Tag(Base):
     __tablename__ = "tags"
+    __table_args__ = (sqlalchemy.Index("ix_tags_name_value", "name", "value"),
+                      sqlalchemy.Index("ix_tags_sim_id_name", "sim_id", "name"))
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
     name = sqlalchemy.Column(sqlalchemy.String)
     value = sqlalchemy.Column(sqlalchemy.Float)
@@ -63,9 +178,12 @@ class Tag(Base):
 
 class OutputFile(Base):
     __tablename__ = "outputfiles"
+    __table_args__ = (sqlalchemy.Index("ix_outputfiles_sim_id_type_iter", "sim_id", "type", "iter"),)
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
     file = sqlalchemy.Column(sqlalchemy.String)
     iter = sqlalchemy.Column(sqlalchemy.Integer)
+    size = sqlalchemy.Column(sqlalchemy.BigInteger)
+    mtime = sqlalchemy.Column(sqlalchemy.BigInteger)
     sim_id = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey('simulations.id'))
 
     filenames = {"diagnostic": "OUT",
@@ -81,5 +199,65 @@ class OutputFile(Base):
 
 
 
+class Result(Base):
+    """
+    The stored result of an analysis of one simulation, valid for one version of the analysis and one state of its input files (see :class:`paddi_utils.db.cache.AnalysisCache`). The values are packed together into a single binary column, so that arrays can be stored as well as scalars.
+    """
+    __tablename__ = "results"
+    __table_args__ = (sqlalchemy.Index("ix_results_sim_id_analysis", "sim_id", "analysis"),)
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    analysis = sqlalchemy.Column(sqlalchemy.String)
+    version = sqlalchemy.Column(sqlalchemy.Integer)
+    fingerprint = sqlalchemy.Column(sqlalchemy.String)
+    data = sqlalchemy.Column(sqlalchemy.LargeBinary)
+    sim_id = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey('simulations.id'))
+    simulation = relationship("Simulation", backref="results")
+
+    @staticmethod
+    def encode(values):
+        """
+        Pack the values of a result: a header giving the name, dtype and shape of each value, followed by the raw bytes of each
+
+        :type values: :class:`dict` with :class:`str` keys
+        :param values: The values, each a scalar or an array of numbers, booleans or strings
+
+        :rtype: :class:`bytes`
+        :return: The packed values
+        """
+        arrays = [np.asarray(value, order="C") for value in values.values()]
+        for name, array in zip(values, arrays):
+            if array.dtype.hasobject:
+                raise TypeError("Value %r cannot be stored, as it is not made of numbers, booleans or strings" % name)
+
+        header = json.dumps([[name, array.dtype.str, array.shape] for name, array in zip(values, arrays)]).encode()
+        return struct.pack("<I", len(header)) + header + b"".join(array.tobytes() for array in arrays)
+
+    @staticmethod
+    def decode(data):
+        """
+        Unpack the values of a result
+
+        :type data: :class:`bytes`
+        :param data: The packed values, as from :func:`Result.encode`
+
+        :rtype: :class:`dict` with :class:`str` keys
+        :return: The values; scalars are returned as python scalars and arrays as :class:`numpy.ndarray`
+        """
+        size, = struct.unpack_from("<I", data)
+        offset = 4 + size
+
+        values = {}
+        for name, dtype, shape in json.loads(data[4:offset].decode()):
+            shape = tuple(shape)
+            array = np.frombuffer(data, np.dtype(dtype), math.prod(shape), offset).reshape(shape)
+            offset += array.nbytes
+            values[name] = array.item() if array.ndim == 0 else array.copy()
+        return values
+
+    @property
+    def values(self):
+        return self.decode(self.data)
+
+
 for name, type in Parameters.default_format:
     setattr(Simulation, name, sqlalchemy.Column(sqlalchemy_types[type]))
@@ -0,0 +1,36 @@
+"""
+This module lets a package import its public classes lazily, when they are first accessed, so that importing the package does not import the heavy dependencies of every one of its modules (e.g., pandas, netCDF4 or SQLAlchemy). A package declares where each of its public names is defined in its ``__init__`` module::
+
+    from paddi_utils.lazy import lazy_import
+
+    __all__, __getattr__, __dir__ = lazy_import(__name__, {"Parameters": "paddi_utils.data.parameters",
+                                                           "Diagnostic": "paddi_utils.data.diagnostic"})
+"""
+import importlib
+import sys
+
+def lazy_import(package, modules):
+    """
+    Build the module-level ``__getattr__`` and ``__dir__`` (see :pep:`562`) of a package whose public names are imported on first access. Each name is imported from its module when it is first accessed and then kept in the globals of the package, so that later accesses do not go through ``__getattr__``.
+
+    :type package: :class:`str`
+    :param package: The name of the package, i.e. its ``__name__``
+    :type modules: :class:`dict` of :class:`str` with :class:`str` keys
+    :param modules: The module defining each public name, keyed by name
+
+    :rtype: :class:`list` of :class:`str`, function, function
+    :return: The ``__all__``, ``__getattr__`` and ``__dir__`` of the package
+    """
+    names = list(modules)
+
+    def __getattr__(name):
+        if name not in modules:
+            raise AttributeError("module %r has no attribute %r" % (package, name))
+        value = getattr(importlib.import_module(modules[name]), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(names))
+
+    return names, __getattr__, __dir__
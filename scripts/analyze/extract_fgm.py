@@ -1,133 +1,72 @@
 import numpy as np
-from scipy.optimize import curve_fit
-import sqlalchemy
 from sqlalchemy import func
 
-import matplotlib.pyplot as plt
-import matplotlib.tri as tri
-from matplotlib.colors import LogNorm
-
-from paddi_utils.data import Parameters, Diagnostic, Spectra
-from paddi_utils.db import Session, Simulation, OutputFile, Tag
-
-
-# A typical guess for exp as (a, l)
-guess = (1.0e-5, -5.)
-
-
-def exp(x, a, l):
-    """A simple function to use for curve fitting"""
-    return a * np.exp(10.**l * x)
-
-
-# Open a SQL session
-session = Session()
-
-# Query for the first output file of each simulation
-q = session.query(Simulation).order_by(func.rand())
-# Add additional filters as desired
-q = q.filter(Simulation.compositional_stratif_param == -3.0)
-q = q.filter(Simulation.z_extent_of_the_box == 25.0)
-
-
-goal_tags = ["linear_growth", "linear_amplitude", "linear_kx", "linear_ky", "linear_kz"]
-
-for sim in q.all():
-    # Check if simulation results are already in the database
-    tags = {tag.name: tag for tag in sim.tags}
-
-    found = True
-    for tag in goal_tags:
-        if tag not in tags:
-            found = False
-
-    if found:
-        continue
-
-    for tag in goal_tags:
-        if tag in tags:
-            session.delete(tags[tag])
-            tags.pop(tag)
-
-    # If the results are already in the database, simply extract them
-    diagnostic_files = []
-    xy_files = []
-    z_files = []
-    for file in sim.output_files:
-        if file.type == "diagnostic":
-            diagnostic_files.append(file.file)
-        if file.type == "xyspec":
-            xy_files.append(file.file)
-        if file.type == "zspec":
-            z_files.append(file.file)
-    diagnostic_files.sort()
-    xy_files.sort()
-    z_files.sort()
-    try:
-        d = Diagnostic(diagnostic_files)
-    except IOError:
-        print("Couldn't find file")
-        continue
-    plt.plot(d["t"][::100], d["Temp_max"][::100])
-    plt.yscale("log")
-    plt.show()
-    median = np.sqrt(np.max(d["Temp_max"]) * np.min(d["Temp_max"]))
-    idx = np.argmax(d["Temp_max"] > median)
-    # Check if this is a decaying simulation
-    if idx == 0 or np.argmax(d["Temp_max"] > 1.0) == 0:
-        print("Decay")
-
-        sim.tags.append(Tag(name="linear_amplitude", value=0.0))
-        sim.tags.append(Tag(name="linear_growth", value=0.0))
-        sim.tags.append(Tag(name="linear_kx", value=0.0))
-        sim.tags.append(Tag(name="linear_ky", value=0.0))
-        sim.tags.append(Tag(name="linear_kz", value=0.0))
-    else:
-        # Set the lower bound to the the global minimum
-        argmin = np.argmin(d["Temp_max"][:])
-        # Set the upper bound to be where the max temperature exceeds unity
-        # Since the temperature is unitless, this is a good value to indicate 
-        # That the system has become nonlinear
-        argmax = np.argmax(d["Temp_max"][:] > 1.0e0)
-        print(argmin, argmax)
-        # Calculate the best exponential fit to the linear region
-        params, cov = curve_fit(exp, d["t"][argmin:argmax], d["Temp_max"][argmin:argmax], p0=guess, method="dogbox", sigma=1/d["Temp_max"][argmin:argmax])
-        print(params)
-        print(cov)
-
-        a, l = params
-        l = 10.0 ** l
-
-        plt.plot(d["t"][:], d["Temp_max"][:])
-        plt.plot(d["t"][argmin:argmax], a * np.exp(l * d["t"][argmin:argmax]))
-        plt.yscale("log")
-        plt.ylim((np.min(d["Temp_max"])/2, np.max(d["Temp_max"]*2)))
-        plt.show()
-
-        # Read the XY spectra
-        xy = Spectra(xy_files, dims=2, idx=idx//200)
-        # Determine the mode with the most energy
+from paddi_utils.analysis import GrowthRates
+from paddi_utils.data import Spectra
+from paddi_utils.db import Session, Simulation, Tag, AnalysisCache
+
+
+if __name__ == "__main__":
+    # Open a SQL session
+    session = Session()
+
+    # Query the simulations in a random order, with their output files
+    table = Simulation.Table(session).order_by(func.random())
+    # Add additional filters as desired
+    table = table.filter(Simulation.compositional_stratif_param == -3.0)
+    table = table.filter(Simulation.z_extent_of_the_box == 25.0)
+
+    spectra = {sim.id: (sim.files("xyspec"), sim.files("zspec")) for sim, tags in table}
+    ids = list(spectra)
+
+    # Fit the growth rate of the runs that are new or whose diagnostic files have changed
+    results = GrowthRates(session).run(ids)
+
+    # The wavenumbers of the fastest growing mode are kept in the catalog in the same way, so only new or changed runs are read
+    modes = AnalysisCache(session, "linear_modes", version=1, types=["diagnostic", "xyspec", "zspec"])
+
+    found = []
+    for sim_id in modes.stale(ids):
+        result = results[sim_id]
+        if result["method"] == "missing":
+            print("Couldn't find file")
+            continue
+
+        # Check if this is a decaying simulation
+        if not result["growth"] > 0.0:
+            print("Decay")
+            found.append((sim_id, {"kx": 0.0, "ky": 0.0, "kz": 0.0}))
+            continue
+
+        # The spectra are written every 200 steps; use the one halfway through the linear phase
+        idx = (result["start"] + result["end"]) // 2 // 200
+        xy_files, z_files = spectra[sim_id]
+        if not xy_files or not z_files:
+            print("Couldn't find file")
+            continue
+        try:
+            # Read the XY spectra
+            xy = Spectra(xy_files, dims=2, idx=idx)
+            # Read the Z spectra
+            z = Spectra(z_files, idx=idx)
+        except IOError:
+            print("Couldn't find file")
+            continue
+
+        # Determine the mode with the most energy, and its wavenumbers
         maxidx = np.unravel_index(xy["energy_u3"][0].argmax(), xy["energy_u3"][0].shape)
-        # Should print the strongest mode's wavenumbers
         kx = xy["k0"][0][maxidx]
         ky = xy["k1"][0][maxidx]
 
-        # Read the Z spectra
-        z = Spectra(z_files, idx=idx//200)
-        # Determine the mode with the most energy
         maxidx = np.unravel_index(z["energy_u3"][0].argmax(), z["energy_u3"][0].shape)
-        # Should print the strongest mode's wavenumbers
         kz = z["k0"][0][maxidx]
 
-        print(kx, ky, kz)
-
-        sim.tags.append(Tag(name="linear_amplitude", value=params[0]))
-        sim.tags.append(Tag(name="linear_growth", value=10.0**params[1]))
-        sim.tags.append(Tag(name="linear_kx", value=kx))
-        sim.tags.append(Tag(name="linear_ky", value=ky))
-        sim.tags.append(Tag(name="linear_kz", value=kz))
+        print(sim_id, result["growth"], kx, ky, kz)
+        found.append((sim_id, {"kx": float(kx), "ky": float(ky), "kz": float(kz)}))
 
+    # Keep the wavenumbers as tags, too, replacing any previous ones
+    names = {"kx": "linear_kx", "ky": "linear_ky", "kz": "linear_kz"}
+    session.query(Tag).filter(Tag.sim_id.in_([sim_id for sim_id, values in found]), Tag.name.in_(list(names.values()))).delete(synchronize_session=False)
+    session.add_all([Tag(sim_id=sim_id, name=names[key], value=value) for sim_id, values in found for key, value in values.items()])
+    modes.put_many(found)
     session.commit()
-
-
-
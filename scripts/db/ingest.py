@@ -0,0 +1,25 @@
+from argparse import ArgumentParser
+
+from paddi_utils.db import Session, Ingest
+
+if __name__ == "__main__":
+	parser = ArgumentParser()
+	parser.add_argument("paths", nargs="*", default=["."])
+	parser.add_argument("--parameter_file", default="parameter_file")
+	parser.add_argument("--url", default=None)
+	parser.add_argument("--batch_size", default=None, type=int)
+	parser.add_argument("--workers", default=1, type=int, help="The number of processes; 0 uses one per processor")
+	parser.add_argument("--sync", action="store_true", help="Only sync the output files of runs that are already cataloged")
+
+	args = parser.parse_args()
+
+	ingest = Ingest(Session(url=args.url), file_name=args.parameter_file, batch_size=args.batch_size, workers=args.workers or None)
+
+	if args.sync:
+		# Write only the output files that have appeared, changed or gone since the last sync
+		counts = ingest.sync(args.paths)
+		print("Inserted %(inserted)d, updated %(updated)d and deleted %(deleted)d output files" % counts)
+	else:
+		# Catalog every run under the paths, skipping those that are already cataloged and unchanged
+		counts = ingest.run(args.paths)
+		print("Added %(added)d, updated %(updated)d and skipped %(skipped)d runs" % counts)
@@ -29,54 +29,61 @@ if args.dump_file is None:
 # Create the dump file object
 dump = Dump(params, args.dump_file, mode="w")
 
-# Start the buoyancy fields with weak perturbations
-for var in ["Chem", "Temp"]:
-	dump[var][:] = (np.random.random(dump[var].shape) - 0.5) * 1.0e-3
-
-# Start the velocity fields with extremely small perturbations
-for var in ["ux", "uy"]:
-	dump[var][:] = (np.random.random(dump[var].shape) - 0.5) * 1.0e-30
-	dump[var][0,0,0,:] = 0.0
-
-# Several modes in the simulation are 0 by construction
-for var in ["Temp", "Chem", "ux", "uy", "uz"]:
-	dump[var][0,0,0,:] = 0.0
-	dump[var][params["max_degree_of_y_fourier_modes"],:,:,:] = 0.0
-	dump[var][:,:,params["max_degree_of_z_fourier_modes"],:] = 0.0
+# The modes that are 0 by construction
+my = params["max_degree_of_y_fourier_modes"]
+mz = params["max_degree_of_z_fourier_modes"]
 
 # Construct the spectral dimension arrays from the dump file
 kx = np.array(dump["kx"]).reshape((1, dump["kx"].size, 1, 1))
 ky = np.array(dump["ky"]).reshape((dump["ky"].size, 1, 1, 1))
 kz = np.array(dump["kz"]).reshape((1, 1, dump["kz"].size, 1))
-
-# Ensure that the field is divergence free
-dump["uz"][:] = -(kx * dump["ux"][:] + ky * dump["uy"][:]) / kz
-dump["uz"][:,:,0,:] = 0.0
+shape = dump["Temp"].shape
 
 # Construct the layer profile in physical space
-nz = params["max_degree_of_z_fourier_modes"] * 2
+nz = mz * 2
 z = np.arange(0.0, nz * 2) * params["z_extent_of_the_box"] / nz - args.offset
 layer = (np.floor(z * args.number / params["z_extent_of_the_box"]))
 layer *= params["z_extent_of_the_box"] / args.number
 
 # Smooth the profile by convolving with a boxcar
-layer = (signal.convolve(layer, signal.boxcar(args.convolve), mode="same") / args.convolve)[:dump["kz"].size]
+layer = (signal.convolve(layer, signal.windows.boxcar(args.convolve), mode="same") / args.convolve)[:dump["kz"].size]
 z = z[:dump["kz"].size]
 
 # Using the layer profile, construct the actual buoyant fields in fourier space
 thermal = np.fft.fft(params["thermal_stratif_param"] * (layer - z)) / (dump["kz"].size)
 compositional = np.fft.fft(params["compositional_stratif_param"] * (layer - z)) / (dump["kz"].size)
 
-# Reshape the complex arrays into real arrays that can be loaded into a netCDF file
-thermal = np.array([[np.array([np.real(thermal), np.imag(thermal)]).T]])
-compositional = np.array([[np.array([np.real(compositional), np.imag(compositional)]).T]])
+# The profiles enter the (0, 0) horizontal mode as real and imaginary parts
+profiles = {"Temp": np.array([np.real(thermal), np.imag(thermal)]).T,
+			"Chem": np.array([np.real(compositional), np.imag(compositional)]).T}
+
+# Start the buoyancy fields with weak perturbations and the velocity fields with extremely small perturbations
+amplitudes = {"Chem": 1.0e-3, "Temp": 1.0e-3, "ux": 1.0e-30, "uy": 1.0e-30}
+
+def perturb(var, index):
+	values = (np.random.random((index.stop - index.start,) + shape[1:]) - 0.5) * amplitudes[var]
 
-# Resize the 1D arrays into 3D arrays padded with 0.0
-thermal.resize((params["max_degree_of_y_fourier_modes"] * 2, params["max_degree_of_x_fourier_modes"] + 1, params["max_degree_of_z_fourier_modes"] * 2, 2))
-compositional.resize((params["max_degree_of_y_fourier_modes"] * 2, params["max_degree_of_x_fourier_modes"] + 1, params["max_degree_of_z_fourier_modes"] * 2, 2))
+	# Several modes in the simulation are 0 by construction
+	values[:,:,mz,:] = 0.0
+	if index.start <= my < index.stop:
+		values[my - index.start] = 0.0
+
+	if index.start == 0:
+		values[0,0,0,:] = 0.0
+		if var in profiles:
+			values[0,0] += profiles[var]
+
+	return values
+
+dump.fill(["Chem", "Temp", "ux", "uy"], perturb)
+
+# Ensure that the field is divergence free
+def divergence_free(var, index):
+	with np.errstate(divide="ignore", invalid="ignore"):
+		values = -(kx * dump["ux"][index] + ky[index] * dump["uy"][index]) / kz
+	values[:,:,0,:] = 0.0
+	return values
 
-# Set the dump file variables to the new arrays
-dump["Temp"][:] += thermal
-dump["Chem"][:] += compositional
+dump.fill("uz", divergence_free)
 
 dump.close()
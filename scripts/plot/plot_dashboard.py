@@ -6,15 +6,18 @@ import glob
 import matplotlib.pyplot as plt
 
 from paddi_utils.plots import PlotArgumentParser
-from paddi_utils.data import Diagnostic, Spectra, Profiles
+from paddi_utils.data import Diagnostic, Spectra, Profiles, Parameters
 
 parser = PlotArgumentParser()
 args = parser.parse_args()
 
 # Construct the Diagnostic data object
-diagnostic_data = Diagnostic(sorted(glob.glob("OUT*")))
-spectral_data = Spectra(sorted(glob.glob("Z_SPEC*")))
-profile_data = Profiles(sorted(glob.glob("ZPROF*")))
+diagnostic_data = Diagnostic(sorted(glob.glob("OUT*")), columns=["t", "flux_Temp", "flux_Chem"])
+
+# The spectra and profiles are streamed from the files one frame at a time
+spectral_files = sorted(glob.glob("Z_SPEC*"))
+profile_files = sorted(glob.glob("ZPROF*"))
+parameters = Parameters.from_header(profile_files[0])
 
 fig = plt.figure(figsize=(18, 10))
 
@@ -51,25 +54,25 @@ chem_axis.set_xlabel("t")
 chem_axis.set_yscale("log")
 
 # Plot faded histories of the spectral data
-for frame in spectral_data:
+for step, time, frame in Spectra.iter_blocks(spectral_files, fields=["k0", "energy_Temp", "energy_Chem", "energy_u3"], copy=True):
 	temp_spec_axis.plot(frame["k0"], frame["energy_Temp"], alpha=0.1, color="black")
 	chem_spec_axis.plot(frame["k0"], frame["energy_Chem"], alpha=0.1, color="black")
 	u_spec_axis.plot(frame["k0"], frame["energy_u3"], alpha=0.1, color="black")
 
 # Plot the most recent thermal energy spectrum in red
-temp_spec_axis.plot(spectral_data[-1]["k0"], spectral_data[-1]["energy_Temp"], color="red")
+temp_spec_axis.plot(frame["k0"], frame["energy_Temp"], color="red")
 temp_spec_axis.set_ylabel("energy\_Temp")
 temp_spec_axis.set_ylim((10**-6, 10**2))
 temp_spec_axis.set_yscale("log")
 
 # Plot the most recent chemical energy spectrum in red
-chem_spec_axis.plot(spectral_data[-1]["k0"], spectral_data[-1]["energy_Chem"], color="red")
+chem_spec_axis.plot(frame["k0"], frame["energy_Chem"], color="red")
 chem_spec_axis.set_ylabel("energy\_Chem")
 chem_spec_axis.set_ylim((10**-6, 10**2))
 chem_spec_axis.set_yscale("log")
 
 # Plot the most recent velocity energy spectrum in red
-u_spec_axis.plot(spectral_data[-1]["k0"], spectral_data[-1]["energy_u3"], color="red")
+u_spec_axis.plot(frame["k0"], frame["energy_u3"], color="red")
 u_spec_axis.set_ylabel("energy\_u3")
 u_spec_axis.set_xlabel("k0")
 u_spec_axis.set_ylim((10**-6, 10**2))
@@ -81,27 +84,28 @@ profiles = [("u1_avg", ux_prof_axis),
             ("Temp", temp_prof_axis),
             ("Chem", chem_prof_axis)]
 
-for key, axis in profiles:
+fields = ["z1", "Temp_avg", "Chem_avg"] + [key for key, axis in profiles]
+for step, time, frame in Profiles.iter_blocks(profile_files, fields=fields, copy=True):
 	# Plot faded histories for the profile data
-	for frame in profile_data:
+	for key, axis in profiles:
 		axis.plot(frame[key], frame["z1"], alpha = 0.1, color="black")
 
-	# Plot the most recent profile data in red
-	axis.plot(profile_data[-1][key], profile_data[-1]["z1"], color="red")
-	axis.set_ylabel("z")
-	axis.set_xlabel(key)
+	# Construct the density field from the parameters of the system
+	rho = (-parameters["B_therm"] / parameters["D_visc"] * frame["Temp_avg"]
+	      + parameters["B_comp"] / parameters["D_visc"] * frame["Chem_avg"]
+	      + (-parameters["S_therm"] + parameters["S_comp"]) * frame["z1"])
 
-# Construct the density field from the parameters of the system
-rho = (-profile_data.parameters["B_therm"] / profile_data.parameters["D_visc"] * profile_data["Temp_avg"]
-      + profile_data.parameters["B_comp"] / profile_data.parameters["D_visc"] * profile_data["Chem_avg"]
-      + (-profile_data.parameters["S_therm"] + profile_data.parameters["S_comp"]) * profile_data["z1"])
+	# Plot faded history of the density profile
+	rho_prof_axis.plot(rho, frame["z1"], alpha = 0.1, color="black")
 
-# Plot faded history of the density profile
-for i, frame in enumerate(profile_data):
-	rho_prof_axis.plot(rho[i], frame["z1"], alpha = 0.1, color="black")
+# Plot the most recent profile data in red
+for key, axis in profiles:
+	axis.plot(frame[key], frame["z1"], color="red")
+	axis.set_ylabel("z")
+	axis.set_xlabel(key)
 
 # Plot the most recent density profile in red
-rho_prof_axis.plot(rho[-1], profile_data[-1]["z1"], color="red")
+rho_prof_axis.plot(rho, frame["z1"], color="red")
 rho_prof_axis.set_ylabel("z")
 rho_prof_axis.set_xlabel("rho")
 
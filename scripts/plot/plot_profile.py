@@ -3,7 +3,7 @@ import glob
 import matplotlib.pyplot as plt
 
 from paddi_utils.plots import PlotArgumentParser
-from paddi_utils.data import Profiles
+from paddi_utils.data import Profiles, Parameters
 
 parser = PlotArgumentParser()
 parser.add_argument("--field", type=str, default="rho_avg")
@@ -13,26 +13,31 @@ args = parser.parse_args()
 if len(args.files) == 0:
     args.files = glob.glob("ZPROF*")
 
-# Construct the Profile data object
-profile_data = Profiles(sorted(args.files))
-
-fig, axis = plt.subplots(1, 1, figsize=(10, 6))
+# Only the first file is needed up front, for the parameters of the system
+parameters = Parameters.from_header(sorted(args.files)[0])
 
 if args.field == "rho_avg":
-    # Construct the density field from the parameters of the system
-    rho = (-profile_data.parameters["B_therm"] / profile_data.parameters["D_visc"] * profile_data["Temp_avg"]
-          + profile_data.parameters["B_comp"] / profile_data.parameters["D_visc"] * profile_data["Chem_avg"]
-          + (-profile_data.parameters["S_therm"] + profile_data.parameters["S_comp"]) * profile_data["z1"])
+    fields = ["z1", "Temp_avg", "Chem_avg"]
 else:
-    rho = profile_data[args.field]
+    fields = ["z1", args.field]
+
+fig, axis = plt.subplots(1, 1, figsize=(10, 6))
+
+# Plot faded history of the density profile, streaming the frames from the files one at a time
+for step, time, frame in Profiles.iter_blocks(sorted(args.files), fields=fields, copy=True):
+    if args.field == "rho_avg":
+        # Construct the density field from the parameters of the system
+        rho = (-parameters["B_therm"] / parameters["D_visc"] * frame["Temp_avg"]
+              + parameters["B_comp"] / parameters["D_visc"] * frame["Chem_avg"]
+              + (-parameters["S_therm"] + parameters["S_comp"]) * frame["z1"])
+    else:
+        rho = frame[args.field]
 
-# Plot faded history of the density profile
-for i, frame in enumerate(profile_data):
-    axis.plot(rho[i], frame["z1"], alpha = 0.1, color="black")
+    axis.plot(rho, frame["z1"], alpha = 0.1, color="black")
 
 # Plot the most recent density profile in red
-axis.plot(rho[-1], profile_data[-1]["z1"], color="red")
+axis.plot(rho, frame["z1"], color="red")
 axis.set_ylabel("z")
 axis.set_xlabel("rho")
 
-plt.save()
+parser.save(fig)
@@ -17,17 +17,14 @@ args = parser.parse_args()
 if len(args.files) == 0:
     args.files = glob.glob("Z_SPEC*")
 
-# Construct the Diagnostic data object
-data = Spectra(args.files)
-
 fig, axis = plt.subplots(1, 1, figsize=(6, 4))
 
-# Plot a faded history of the spectrum
-for dataframe in data:
+# Plot a faded history of the spectrum, streaming the frames from the files one at a time
+for step, time, dataframe in Spectra.iter_blocks(args.files, fields=["k0", args.field], copy=True):
 	axis.plot(dataframe["k0"], dataframe[args.field], alpha=0.3, color="black")
 
 # Plot the most recent spectrum in red
-axis.plot(data[-1]["k0"], dataframe[args.field], color="red")
+axis.plot(dataframe["k0"], dataframe[args.field], color="red")
 
 axis.set_yscale("log")
 
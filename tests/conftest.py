@@ -0,0 +1,16 @@
+import pytest
+
+NAMELIST = """&input_values
+thermal_buoyancy_param=1.0, compositional_buoyancy_param=1.0, viscous_diffusion_coeff=1.0, thermal_diffusion_coeff=1.0,
+compositional_diffusion_coeff=0.1, thermal_stratif_param=1.0, compositional_stratif_param=-1.0, x_extent_of_the_box=10.0,
+y_extent_of_the_box=10.0, z_extent_of_the_box=100.0, cfl_safety_factor=0.5, maximum_time_step_length=0.1,
+initial_time_step_length=0.01, max_degree_of_x_fourier_modes=16, max_degree_of_y_fourier_modes=16,
+max_degree_of_z_fourier_modes=32, number_of_tasks_1st_transpose=1, number_of_tasks_2nd_transpose=1
+/
+"""
+
+
+@pytest.fixture
+def namelist():
+    # A small parameter file, with 48 x 48 x 96 grid points
+    return NAMELIST
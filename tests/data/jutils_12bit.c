@@ -0,0 +1,42 @@
+/*
+ * Writes tests/data/jutils_12bit with extern/jutils: three records of a 16 x 8 x 4 field,
+ * x = sin(2 pi i / nx) cos(2 pi j / ny) + 0.25 k + 0.1 q, as 12-bit JPEG at quality 99 (Temp) and 75 (Chem)
+ * and as an XDR stream (quality 100, VelX). Built from extern/jutils with
+ *
+ *     cd extern/jutils/jpeg12 && ./configure CC="gcc -D_GNU_SOURCE -fPIC" && make && cd ..
+ *     gcc -I. -Ijpeg12 -DUSE12B -D_FILE_OFFSET_BITS=64 -I/usr/include/tirpc jutils_12bit.c \
+ *         jcopen_.c jcwinfo_.c jcwrite_.c jcclose_.c jcend_.c divisions.c jpeg12/libjpeg.a -ltirpc -lm
+ */
+#include <stdio.h>
+#include <math.h>
+
+#include "inout.h"
+#include "jcmagic.h"
+
+FILE *fpo[MAXFILES];
+
+int jcopen_(int *iu, int *magic, char *file, char *acc, int flen, int acclen);
+int jcwinfo_(int *iu, float *ra, float *ras, int *iddc, float *le, int *numx, int *numy, int *numz);
+int jcwrite_(int *iu, int *magic, int *niter, float *time, float *dt, float *x, int *xdim, int *ydim, int *zdim, int *quality);
+int jcclose_(int *iu);
+
+int main(int argc, char **argv) {
+  int iu = 1, magic = JC3D, nx = 16, ny = 8, nz = 4, iddc = 4, i, j, k, q, step;
+  float ra = 1.0e4, ras = 10.0, le = 0.0, x[16 * 8 * 4], time, dt = 0.01;
+  int quality[3] = {99, 75, 100}, fields[3] = {JPTEMP, JPCHEM, JPVELX};
+  char file[] = "jutils_12bit";
+
+  jcopen_(&iu, &magic, file, "w", sizeof(file) - 1, 1);
+  jcwinfo_(&iu, &ra, &ras, &iddc, &le, &nx, &ny, &nz);
+  for (q = 0; q < 3; q++) {
+    for (k = 0; k < nz; k++)
+      for (j = 0; j < ny; j++)
+        for (i = 0; i < nx; i++)
+          x[(k * ny + j) * nx + i] = sinf(2.0f * 3.14159265f * i / nx) * cosf(2.0f * 3.14159265f * j / ny) + 0.25f * k + 0.1f * q;
+    step = 10 * q;
+    time = 0.5f * q;
+    jcwrite_(&iu, &fields[q], &step, &time, &dt, x, &nx, &ny, &nz, &quality[q]);
+  }
+  jcclose_(&iu);
+  return 0;
+}
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from paddi_utils.db import Session, Simulation, OutputFile, AnalysisCache
+
+
+@pytest.fixture
+def session(tmp_path):
+    session = Session(url="sqlite:///%s" % (tmp_path / "catalog.db"))
+    sims = [Simulation(path=str(tmp_path / ("run%d" % i))) for i in range(3)]
+    session.add_all(sims)
+    session.flush()
+    session.add_all([OutputFile(sim_id=sim.id, file=str(tmp_path / ("run%d" % i) / "OUT01"), type="diagnostic", size=100, mtime=i) for i, sim in enumerate(sims)])
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_numpy_ids(session):
+    cache = AnalysisCache(session, "test", types=["diagnostic"])
+    ids = np.array([sim_id for (sim_id,) in session.query(Simulation.id).order_by(Simulation.id)])
+    assert cache.key(ids[0]) == int(ids[0])
+
+    cache.put_many([(sim_id, {"value": float(sim_id)}) for sim_id in ids])
+    assert cache.stale(list(ids)) == []
+    assert cache.get(ids[1]) == {"value": float(ids[1])}
+
+
+def test_put_leaves_commit_to_caller(session):
+    cache = AnalysisCache(session, "test", types=["diagnostic"])
+    sim_id = session.query(Simulation.id).first()[0]
+
+    cache.put(sim_id, {"value": 1.0})
+    session.rollback()
+    assert cache.get(sim_id) is None
+
+    cache.put(sim_id, {"value": 1.0})
+    session.commit()
+    assert cache.get(sim_id) == {"value": 1.0}
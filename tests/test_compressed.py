@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pytest
+
+from paddi_utils.data import compressed
+from paddi_utils.data.compressed import CompressedFile, JPTEMP, JPCHEM, JPVELX
+
+# Written by extern/jutils from data/jutils_12bit.c
+FILE_NAME = os.path.join(os.path.dirname(__file__), "data", "jutils_12bit")
+
+
+def expected(q):
+    # The field written for record q, in single precision as in the writer
+    i = np.arange(16, dtype=np.float32)
+    j = np.arange(8, dtype=np.float32)[:, None]
+    k = np.arange(4, dtype=np.float32)[:, None, None]
+    two_pi = np.float32(2.0 * 3.14159265)
+    return np.sin(two_pi * i / 16) * np.cos(two_pi * j / 8) + np.float32(0.25) * k + np.float32(0.1) * q
+
+
+def test_records():
+    with CompressedFile(FILE_NAME, index=False) as data:
+        assert len(data) == 3
+        assert list(data.records["magic"]) == [JPTEMP, JPCHEM, JPVELX]
+        assert list(data.records["iteration"]) == [0, 10, 20]
+
+
+def test_xdr_round_trip():
+    with CompressedFile(FILE_NAME, index=False) as data:
+        np.testing.assert_allclose(data.read_record(2), expected(2), atol=1.0e-6)
+
+
+@pytest.mark.parametrize("q, atol", [(0, 2.0e-3), (1, 2.0e-2)])
+def test_jpeg_round_trip(q, atol):
+    pytest.importorskip("imagecodecs")
+    with CompressedFile(FILE_NAME, index=False) as data:
+        np.testing.assert_allclose(data.read_record(q), expected(q), atol=atol)
+
+
+def test_jpeg_12bit_requires_imagecodecs(monkeypatch):
+    monkeypatch.setattr(compressed, "imagecodecs", None)
+    with CompressedFile(FILE_NAME, index=False) as data:
+        with pytest.raises(ImportError, match="jdata"):
+            data.read_record(0)
@@ -0,0 +1,36 @@
+import pytest
+
+from paddi_utils.data import Dump, Parameters
+
+
+@pytest.fixture
+def dump_file(tmp_path, namelist):
+    (tmp_path / "parameter_file").write_text(namelist)
+    file_name = str(tmp_path / "dump.cdf")
+    Dump(Parameters.from_file(str(tmp_path / "parameter_file")), file_name).close()
+    Parameters.cache.clear()
+    yield file_name
+    Parameters.cache.clear()
+
+
+def test_from_nc_writable_is_live(dump_file):
+    with Dump.from_file(dump_file, mode="a") as dump:
+        assert dump.get_parameters()["z_extent_of_the_box"] == 100.0
+        dump["Gammaz"][:] = 42.0
+        assert dump.get_parameters()["z_extent_of_the_box"] == 42.0
+        assert "open_mode" not in dump.ncattrs()
+    assert len(Parameters.cache) == 0
+
+
+def test_from_nc_read_only_is_cached(dump_file):
+    for i in range(2):
+        with Dump.from_file(dump_file, mode="r") as dump:
+            assert dump.get_parameters()["z_extent_of_the_box"] == 100.0
+    assert Parameters.cache.info()["hits"] == 1
+
+
+def test_cache_copies_mutable_values():
+    Parameters.cache.put("key", {"values": [1, 2]})
+    Parameters.cache.get("key")["values"].append(3)
+    assert Parameters.cache.get("key")["values"] == [1, 2]
+    Parameters.cache.clear()
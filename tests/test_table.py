@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+
+from paddi_utils.data import Parameters, ParameterTable
+
+
+@pytest.fixture
+def runs(tmp_path, namelist):
+    for run in ("a", "b"):
+        os.mkdir(str(tmp_path / run))
+        (tmp_path / run / "parameter_file").write_text(namelist)
+    Parameters.cache.clear()
+    yield tmp_path
+    Parameters.cache.clear()
+
+
+def test_from_directory_after_from_file(runs):
+    # Warm the cache with the raw namelist of one run, as Parameters.from_file (e.g., from an ingest) does
+    Parameters.from_file(str(runs / "a" / "parameter_file"))
+
+    table = ParameterTable.from_directory(str(runs))
+    assert list(table["nx"]) == [48, 48]
+    assert list(table["nz"]) == [96, 96]
+    assert table["nx"].dtype == np.int64
+
+
+def test_from_directory_cached(runs):
+    first = ParameterTable.from_directory(str(runs))
+    Parameters.cache.hits = Parameters.cache.misses = 0
+
+    second = ParameterTable.from_directory(str(runs))
+    assert second.equals(first)
+    assert Parameters.cache.info()["hits"] == 2
+    assert Parameters.cache.info()["misses"] == 0